@@ -0,0 +1,185 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Tuple
+
+from metrics import REGISTRY
+
+ADMISSION_WAIT = REGISTRY.histogram(
+    "admission_queue_wait_seconds",
+    "Time requests waited for admission, by outcome (admitted or rejected)",
+    ["outcome"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+)
+ADMISSION_REJECTED = REGISTRY.counter(
+    "admission_rejected_total",
+    "Requests rejected with 429 by reason (user_limit, queue_full or timeout)",
+    ["reason"],
+)
+
+
+class AdmissionRejected(Exception):
+    """
+    Request refused before any work started; retry_after is a hint in
+    whole seconds
+    """
+
+    def __init__(self, reason: str, message: str, retry_after: int):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """
+    An admitted request's slot. release() is idempotent, so it can be
+    wired to several completion paths.
+    """
+
+    def __init__(self, controller: "AdmissionController", key: str):
+        self._controller = controller
+        self._key = key
+        self._start = time.perf_counter()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self._key, time.perf_counter() - self._start)
+
+
+class AdmissionController:
+    """
+    Per-caller and global in-flight limits with a short wait queue.
+
+    A request runs at once when fewer than max_in_flight requests are
+    running and its caller has fewer than max_in_flight_per_user of them.
+    Otherwise it waits (FIFO, but a caller at its own limit never blocks
+    the others) for at most queue_timeout seconds. Requests are rejected
+    without waiting when the queue is full or the caller already has
+    max_in_flight_per_user requests queued, so one caller cannot fill the
+    queue either.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 32,
+        max_in_flight_per_user: int = 4,
+        max_queue: int = 16,
+        queue_timeout: float = 2.0,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_user = max_in_flight_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._in_flight = 0
+        self._running: Dict[str, int] = {}
+        self._queued: Dict[str, int] = {}
+        self._waiters: Deque[Tuple[str, asyncio.Future]] = deque()
+        # Moving average of request duration, for Retry-After
+        self._service_time = 1.0
+
+    async def acquire(self, key: str) -> AdmissionTicket:
+        """
+        Admit a request from caller key or raise AdmissionRejected
+        """
+        if self._can_run(key):
+            self._start(key)
+            ADMISSION_WAIT.observe(0, outcome="admitted")
+            return AdmissionTicket(self, key)
+
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full", "Server busy, try again later")
+        if self._queued.get(key, 0) >= self.max_in_flight_per_user:
+            self._reject("user_limit", "Too many concurrent requests for this user")
+
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((key, waiter))
+        self._queued[key] = self._queued.get(key, 0) + 1
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            ADMISSION_WAIT.observe(time.perf_counter() - start, outcome="rejected")
+            self._reject("timeout", "Server busy, try again later")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Admitted just as the client went away
+                self._release(key, 0)
+            raise
+        finally:
+            if waiter.cancelled():
+                # Timed out or cancelled: give up the queue place now so it
+                # no longer counts against max_queue
+                self._drop_waiter(key, waiter)
+            self._queued[key] -= 1
+            if not self._queued[key]:
+                del self._queued[key]
+
+        ADMISSION_WAIT.observe(time.perf_counter() - start, outcome="admitted")
+        return AdmissionTicket(self, key)
+
+    @asynccontextmanager
+    async def admit(self, key: str):
+        ticket = await self.acquire(key)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self._in_flight,
+            "queued": sum(1 for _, waiter in self._waiters if not waiter.done()),
+            "callers": len(self._running),
+        }
+
+    def _can_run(self, key: str) -> bool:
+        return (
+            self._in_flight < self.max_in_flight
+            and self._running.get(key, 0) < self.max_in_flight_per_user
+        )
+
+    def _start(self, key: str) -> None:
+        self._in_flight += 1
+        self._running[key] = self._running.get(key, 0) + 1
+
+    def _release(self, key: str, duration: float) -> None:
+        self._in_flight -= 1
+        self._running[key] -= 1
+        if not self._running[key]:
+            del self._running[key]
+        if duration:
+            self._service_time = 0.9 * self._service_time + 0.1 * duration
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        skipped: Deque[Tuple[str, asyncio.Future]] = deque()
+        while self._waiters and self._in_flight < self.max_in_flight:
+            key, waiter = self._waiters.popleft()
+            if waiter.done():
+                # Timed out or cancelled
+                continue
+            if not self._can_run(key):
+                skipped.append((key, waiter))
+                continue
+            self._start(key)
+            waiter.set_result(None)
+        skipped.extend(self._waiters)
+        self._waiters = skipped
+
+    def _drop_waiter(self, key: str, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove((key, waiter))
+        except ValueError:
+            # Already skipped by _dispatch
+            pass
+
+    def _reject(self, reason: str, message: str) -> None:
+        ADMISSION_REJECTED.inc(reason=reason)
+        raise AdmissionRejected(
+            reason, message, retry_after=max(1, math.ceil(self._service_time))
+        )
@@ -1,14 +1,78 @@
 import os
 import json
-import uuid
+import asyncio
+import time
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple, Union
 import logging
-from google import genai
-from google.genai import types
+from contextlib import nullcontext
+
+import summaries
+from ids import uuid7
+from metrics import REGISTRY, add_timings, stage, start_timings
+from model_scheduler import ModelScheduler, ModelUnavailableError
+from result_set import ResultSet
+from schema_cache import SchemaSnapshot
+from schema_context import estimate_tokens
+from singleflight import SingleFlight
+from sql_cache import SQLCache, normalize_query
 
 logger = logging.getLogger(__name__)
 
+# Rows shown to the model when summarizing a result
+SUMMARY_SAMPLE_ROWS = 10
+
+QUERY_LATENCY = REGISTRY.histogram(
+    "agent_query_latency_seconds",
+    "End-to-end AIAgent.process_query latency by summary strategy",
+    ["strategy"],
+)
+SCHEMA_PROMPT_TOKENS = REGISTRY.histogram(
+    "agent_schema_prompt_tokens",
+    "Estimated tokens of schema context sent per SQL generation",
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000),
+)
+QUERY_FLIGHTS = REGISTRY.counter(
+    "agent_query_flights_total",
+    "process_query calls that ran the pipeline (leader) or joined an "
+    "identical in-flight call (follower)",
+    ["role"],
+)
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total",
+    "Gemini tokens by call (sql or summary) and kind (prompt or output)",
+    ["call", "kind"],
+)
+SUMMARY_LATENCY = REGISTRY.histogram(
+    "agent_summary_latency_seconds",
+    "Time spent producing the response summary by strategy",
+    ["strategy"],
+)
+
+
+def _record_usage(response, call: str) -> None:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    LLM_TOKENS.inc(usage.prompt_token_count or 0, call=call, kind="prompt")
+    LLM_TOKENS.inc(usage.candidates_token_count or 0, call=call, kind="output")
+
+
+class PipelineSlots:
+    """
+    Concurrency limits for the stages of a batch: SQL generation and LLM
+    summaries take a model slot, execution takes a database slot. An item
+    waiting on one stage does not hold the other, so stages overlap.
+    """
+
+    def __init__(self, model: int, database: int):
+        self.model = asyncio.Semaphore(model)
+        self.database = asyncio.Semaphore(database)
+
+
+def _slot(slots: Optional[PipelineSlots], name: str):
+    return getattr(slots, name) if slots is not None else nullcontext()
+
 
 class AIAgent:
     """
@@ -18,44 +82,168 @@ class AIAgent:
     def __init__(self, db_service, storage_service):
         self.db_service = db_service
         self.storage_service = storage_service
-        self.client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+        # google.genai takes seconds to import, so the SDK is loaded off the
+        # event loop by warm_up() or before the first model call rather than
+        # at import time (see _ensure_sdk)
+        self._client = None
+        self._types = None
         self.model = "gemini-2.0-flash"
 
+        # Every Gemini call goes through the scheduler: adaptive concurrency,
+        # optional rate limit, retries and hedging (see model_scheduler)
+        self.scheduler = ModelScheduler(
+            initial_limit=int(os.getenv("MODEL_INITIAL_CONCURRENCY", "8")),
+            min_limit=int(os.getenv("MODEL_MIN_CONCURRENCY", "1")),
+            max_limit=int(os.getenv("MODEL_MAX_CONCURRENCY", "32")),
+            rate=float(os.getenv("MODEL_RATE_LIMIT", "0")),
+            burst=float(os.getenv("MODEL_RATE_BURST", "10")),
+            max_attempts=int(os.getenv("MODEL_MAX_ATTEMPTS", "3")),
+            retry_budget=float(os.getenv("MODEL_RETRY_BUDGET", "0.2")),
+            backoff_base=float(os.getenv("MODEL_BACKOFF_BASE_MS", "200")) / 1000,
+            backoff_max=float(os.getenv("MODEL_BACKOFF_MAX_MS", "5000")) / 1000,
+            call_timeout=float(os.getenv("MODEL_CALL_TIMEOUT", "30")),
+            queue_timeout=float(os.getenv("MODEL_QUEUE_TIMEOUT", "10")),
+            hedge_delay=float(os.getenv("MODEL_HEDGE_DELAY_MS", "0")) / 1000,
+        )
+
+        threshold = os.getenv("SQL_CACHE_SIMILARITY_THRESHOLD")
+        self.sql_cache = SQLCache(
+            max_entries=int(os.getenv("SQL_CACHE_MAX_ENTRIES", "1024")),
+            max_bytes=int(os.getenv("SQL_CACHE_MAX_BYTES", str(4 * 1024 * 1024))),
+            ttl_seconds=float(os.getenv("SQL_CACHE_TTL", "3600")),
+            similarity_threshold=float(threshold) if threshold else None,
+        )
+
+        # Schema context per SQL prompt; 0 sends every table
+        self.schema_token_budget = int(os.getenv("SCHEMA_PROMPT_TOKEN_BUDGET", "4000"))
+
+        # auto, llm, template or none; callers may override per request
+        self.summary_strategy = os.getenv("SUMMARY_STRATEGY", summaries.AUTO)
+
+        self.coalesce = os.getenv("QUERY_COALESCING", "true").lower() == "true"
+        self._flight = SingleFlight()
+
+        # Per-batch limits; database slots default to the pool size (of the
+        # primary and read replicas) so a batch leaves the overflow
+        # connections to interactive queries
+        self.batch_model_concurrency = int(os.getenv("BATCH_MODEL_CONCURRENCY", "8"))
+        self.batch_db_concurrency = int(
+            os.getenv("BATCH_DB_CONCURRENCY", str(db_service.read_pool_size))
+        )
+
+    @property
+    def client(self):
+        if self._client is None:
+            from google import genai
+
+            self._client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    async def warm_up(self, ping: bool = False) -> None:
+        """
+        Import the SDK and create the client off the event loop; with ping,
+        also send a one-token request so the first query does not pay for
+        connection setup
+        """
+        await self._ensure_sdk()
+        if ping:
+            await self.client.aio.models.generate_content(
+                model=self.model,
+                contents="ping",
+                config=self._generation_config(max_output_tokens=1),
+            )
+
+    async def _ensure_sdk(self) -> None:
+        """
+        Import google.genai and create the client in a worker thread, so
+        a skipped or failed warm-up does not block the event loop for the
+        seconds the import takes
+        """
+        if self._client is None or self._types is None:
+            await asyncio.to_thread(self._load_sdk)
+
+    def _load_sdk(self) -> None:
+        from google.genai import types
+
+        self._types = types
+        self._client = self.client
+
+    def _generation_config(self, **kwargs):
+        return self._types.GenerateContentConfig(**kwargs)
+
     async def process_query(
         self,
         query: str,
         user_id: Optional[str] = None,
         context: Optional[Dict[str, Any]] = None,
+        summary: Optional[str] = None,
+        schema: Optional[SchemaSnapshot] = None,
+        slots: Optional[PipelineSlots] = None,
     ) -> Dict[str, Any]:
         """
         Process user query through AI agent workflow:
         1. Understand user intent
         2. Generate database query
         3. Execute query
-        4. Format response
+        4. Format response (LLM, template or none, see summaries)
+
+        schema and slots are supplied by process_batch.
         """
-        query_id = str(uuid.uuid4())
+        query_id = str(uuid7())
         timestamp = datetime.utcnow().isoformat()
+        start = time.perf_counter()
+        summary = summary or self.summary_strategy
 
         try:
-            sql_query = await self._generate_sql_query(query, context)
-            logger.info(f"Generated SQL: {sql_query}")
+            if schema is None:
+                with stage("schema"):
+                    schema = await self.db_service.get_schema_snapshot()
 
-            db_results = await self.db_service.execute_query(sql_query)
-            logger.info(f"Database returned {len(db_results)} results")
+            if self.coalesce:
+                # Identical questions already in flight share one pipeline
+                # run; each caller still gets its own query_id
+                key = (
+                    normalize_query(query),
+                    json.dumps(context, sort_keys=True, default=str),
+                    schema.fingerprint,
+                    summary,
+                )
+                role = "follower" if self._flight.in_flight(key) else "leader"
+                QUERY_FLIGHTS.inc(role=role)
+                answer = await self._flight.do(
+                    key,
+                    lambda: self._shared_answer(query, context, summary, schema, slots),
+                )
+                add_timings(answer["timings"])
+            else:
+                role = "leader"
+                answer = await self._answer(query, context, summary, schema, slots)
 
-            response_text = await self._generate_response(
-                original_query=query, sql_query=sql_query, db_results=db_results
+            db_results = answer["result_set"]
+            QUERY_LATENCY.observe(
+                time.perf_counter() - start, strategy=answer["summary_strategy"]
             )
 
             return {
                 "query_id": query_id,
                 "timestamp": timestamp,
-                "response": response_text,
+                "response": answer["response"],
+                "result_set": db_results,
                 "data": {
-                    "results": db_results,
                     "count": len(db_results),
-                    "sql_query": sql_query,
+                    "truncated": db_results.truncated,
+                    "sql_query": answer["sql_query"],
+                    "sql_fingerprint": self.db_service.sql_fingerprint(
+                        answer["sql_query"]
+                    ),
+                    "cached": answer["cached_at"] is not None,
+                    "cached_at": answer["cached_at"],
+                    "summary_strategy": answer["summary_strategy"],
+                    "coalesced": role == "follower",
                 },
             }
 
@@ -63,18 +251,200 @@ class AIAgent:
             logger.error(f"Error in AI agent processing: {str(e)}")
             raise
 
+    async def process_batch(
+        self,
+        items: List[Dict[str, Any]],
+        user_id: Optional[str] = None,
+        summary: Optional[str] = None,
+    ) -> AsyncIterator[Tuple[int, Union[Dict[str, Any], Exception]]]:
+        """
+        Answer many questions against one schema snapshot, yielding
+        (index, result) as each item finishes. result is what
+        process_query returns, or the exception the item failed with.
+        Items run concurrently within the batch_*_concurrency limits and
+        identical questions are coalesced.
+        """
+        with stage("schema"):
+            schema = await self.db_service.get_schema_snapshot()
+        slots = PipelineSlots(self.batch_model_concurrency, self.batch_db_concurrency)
+
+        async def run(index: int, item: Dict[str, Any]):
+            try:
+                result = await self.process_query(
+                    query=item["query"],
+                    user_id=user_id,
+                    context=item.get("context"),
+                    summary=item.get("summary") or summary,
+                    schema=schema,
+                    slots=slots,
+                )
+            except Exception as e:
+                return index, e
+            return index, result
+
+        tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The consumer went away (client disconnect): stop the rest.
+            # A coalesced pipeline stops too unless a caller outside this
+            # batch is still waiting on it (see SingleFlight).
+            for task in tasks:
+                task.cancel()
+
+    async def _shared_answer(self, *args) -> Dict[str, Any]:
+        """
+        _answer run as a shared flight, with the stage timings it collected
+        for every caller to report
+        """
+        timings = start_timings()
+        answer = await self._answer(*args)
+        return {**answer, "timings": timings}
+
+    async def _answer(
+        self,
+        query: str,
+        context: Optional[Dict[str, Any]],
+        summary: str,
+        schema: SchemaSnapshot,
+        slots: Optional[PipelineSlots] = None,
+    ) -> Dict[str, Any]:
+        """
+        The shared part of process_query: generate SQL, run it and
+        summarize the result
+        """
+        async with _slot(slots, "model"):
+            sql_query = await self._generate_sql_query(query, context, schema)
+        logger.info(f"Generated SQL: {sql_query}")
+
+        async with _slot(slots, "database"):
+            db_results, cached_at = await self.db_service.execute_cached(sql_query)
+        logger.info(f"Database returned {len(db_results)} results")
+        if db_results.truncated:
+            logger.warning(f"Result truncated to {len(db_results)} rows")
+
+        strategy = summaries.choose_strategy(
+            summary,
+            len(db_results.columns),
+            len(db_results),
+            db_results.truncated,
+        )
+        with SUMMARY_LATENCY.time(strategy=strategy), stage("summary"):
+            if strategy == summaries.LLM:
+                async with _slot(slots, "model"):
+                    response_text = await self._generate_response(
+                        original_query=query, sql_query=sql_query, db_results=db_results
+                    )
+            elif strategy == summaries.TEMPLATE:
+                response_text = summaries.template_summary(
+                    db_results.columns,
+                    db_results.rows[: summaries.TEMPLATE_MAX_ROWS],
+                    len(db_results),
+                )
+            else:
+                response_text = ""
+
+        return {
+            "sql_query": sql_query,
+            "result_set": db_results,
+            "cached_at": cached_at,
+            "response": response_text,
+            "summary_strategy": strategy,
+        }
+
+    async def process_query_stream(
+        self,
+        query: str,
+        user_id: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+        summary: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of process_query. Yields events in order:
+        sql, columns, rows (one per cursor batch), summary (one per model
+        chunk) and done. Only the rows needed for the summary prompt are
+        kept in memory.
+        """
+        query_id = str(uuid7())
+        timestamp = datetime.utcnow().isoformat()
+
+        sql_query = await self._generate_sql_query(query, context)
+        logger.info(f"Generated SQL: {sql_query}")
+        yield {"event": "sql", "query_id": query_id, "sql_query": sql_query}
+
+        columns: List[str] = []
+        sample: List[tuple] = []
+        count = 0
+        truncated = False
+        async for chunk in self.db_service.stream_query(sql_query):
+            if not columns:
+                columns = chunk.columns
+                yield {"event": "columns", "columns": columns}
+            if chunk.rows:
+                yield {"event": "rows", "rows": chunk.rows}
+
+            sample.extend(chunk.rows[: SUMMARY_SAMPLE_ROWS - len(sample)])
+            count += len(chunk)
+            truncated = truncated or chunk.truncated
+
+        logger.info(f"Database returned {count} results")
+
+        strategy = summaries.choose_strategy(
+            summary or self.summary_strategy, len(columns), count, truncated
+        )
+        if strategy == summaries.LLM:
+            async for text in self._generate_response_stream(
+                original_query=query,
+                sql_query=sql_query,
+                sample=[dict(zip(columns, row)) for row in sample],
+                count=count,
+            ):
+                yield {"event": "summary", "text": text}
+        elif strategy == summaries.TEMPLATE:
+            yield {
+                "event": "summary",
+                "text": summaries.template_summary(
+                    columns, sample[: summaries.TEMPLATE_MAX_ROWS], count
+                ),
+            }
+
+        yield {
+            "event": "done",
+            "query_id": query_id,
+            "timestamp": timestamp,
+            "count": count,
+            "truncated": truncated,
+            "summary_strategy": strategy,
+        }
+
     async def _generate_sql_query(
-        self, user_query: str, context: Optional[Dict[str, Any]] = None
+        self,
+        user_query: str,
+        context: Optional[Dict[str, Any]] = None,
+        schema: Optional[SchemaSnapshot] = None,
     ) -> str:
         """
         Use Gemini to convert natural language query to SQL
         """
-        schema_info = await self.db_service.get_schema_info()
+        if schema is None:
+            with stage("schema"):
+                schema = await self.db_service.get_schema_snapshot()
+
+        cached_sql = self.sql_cache.get(user_query, context, schema.fingerprint)
+        if cached_sql is not None:
+            logger.info("SQL cache hit")
+            return cached_sql
+
+        schema_prompt = schema.prompt
+        if schema.index is not None:
+            schema_prompt = schema.index.select(user_query, self.schema_token_budget)
+        SCHEMA_PROMPT_TOKENS.observe(estimate_tokens(schema_prompt))
 
         system_prompt = f"""You are a SQL expert. Convert user queries to valid SQL.
 
 Database Schema:
-{json.dumps(schema_info, indent=2)}
+{schema_prompt}
 
 Rules:
 - Only generate SELECT queries (no INSERT, UPDATE, DELETE)
@@ -93,28 +463,43 @@ Query: {user_query}
 Return only the SQL query."""
 
         try:
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=f"{system_prompt}\n\n{user_prompt}",
-                config=types.GenerateContentConfig(
-                    max_output_tokens=1024,
-                ),
-            )
+            with stage("sql_generation"):
+                await self._ensure_sdk()
+                response = await self.scheduler.call(
+                    "sql",
+                    lambda: self.client.aio.models.generate_content(
+                        model=self.model,
+                        contents=f"{system_prompt}\n\n{user_prompt}",
+                        config=self._generation_config(
+                            max_output_tokens=1024,
+                        ),
+                    ),
+                )
+            _record_usage(response, "sql")
 
             sql_query = response.text.strip()
             sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
 
-            return sql_query
-
+        except ModelUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error generating SQL: {str(e)}")
             raise ValueError(f"Failed to generate SQL query: {str(e)}")
 
-    async def _generate_response(
-        self, original_query: str, sql_query: str, db_results: List[Dict[str, Any]]
+        # Rejected statements raise here and are never cached
+        sql_query = self.db_service.validate_sql(sql_query)
+        self.sql_cache.set(user_query, context, schema.fingerprint, sql_query)
+        return sql_query
+
+    def _build_response_prompt(
+        self,
+        original_query: str,
+        sql_query: str,
+        sample: List[Dict[str, Any]],
+        count: int,
     ) -> str:
         """
-        Use Gemini to generate natural language response from database results
+        Build the summarization prompt from the first rows of a result
         """
         system_prompt = """You are a helpful AI assistant that explains database query results to users in a clear, conversational way.
 
@@ -125,27 +510,98 @@ Your task:
 - Keep responses concise but informative
 """
 
+        more = ""
+        if count > SUMMARY_SAMPLE_ROWS:
+            more = f"... and {count - SUMMARY_SAMPLE_ROWS} more rows"
+
         user_prompt = f"""User asked: "{original_query}"
 
 SQL query executed: {sql_query}
 
-Results ({len(db_results)} rows):
-{json.dumps(db_results[:10], indent=2, default=str)}
-{f"... and {len(db_results) - 10} more rows" if len(db_results) > 10 else ""}
+Results ({count} rows):
+{json.dumps(sample[:SUMMARY_SAMPLE_ROWS], indent=2, default=str)}
+{more}
 
 Provide a natural language response to the user's question based on these results."""
 
+        return f"{system_prompt}\n\n{user_prompt}"
+
+    async def _generate_response(
+        self, original_query: str, sql_query: str, db_results: ResultSet
+    ) -> str:
+        """
+        Use Gemini to generate natural language response from database results
+        """
+        prompt = self._build_response_prompt(
+            original_query,
+            sql_query,
+            db_results.to_dicts(limit=SUMMARY_SAMPLE_ROWS),
+            len(db_results),
+        )
+
         try:
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=f"{system_prompt}\n\n{user_prompt}",
-                config=types.GenerateContentConfig(
-                    max_output_tokens=2048,
+            await self._ensure_sdk()
+            response = await self.scheduler.call(
+                "summary",
+                lambda: self.client.aio.models.generate_content(
+                    model=self.model,
+                    contents=prompt,
+                    config=self._generation_config(
+                        max_output_tokens=2048,
+                    ),
                 ),
             )
+            _record_usage(response, "summary")
 
             return response.text
 
+        except Exception as e:
+            # The rows are already there; describe them without the model
+            logger.error(f"Error generating response: {str(e)}")
+            return summaries.template_summary(
+                db_results.columns,
+                db_results.rows[: summaries.TEMPLATE_MAX_ROWS],
+                len(db_results),
+            )
+
+    async def _generate_response_stream(
+        self,
+        original_query: str,
+        sql_query: str,
+        sample: List[Dict[str, Any]],
+        count: int,
+    ) -> AsyncIterator[str]:
+        """
+        Stream the natural language response chunk by chunk
+        """
+        prompt = self._build_response_prompt(original_query, sql_query, sample, count)
+
+        emitted = False
+        try:
+            await self._ensure_sdk()
+            async with self.scheduler.slot("summary"):
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=self.model,
+                    contents=prompt,
+                    config=self._generation_config(
+                        max_output_tokens=2048,
+                    ),
+                )
+                usage = None
+                async for chunk in stream:
+                    usage = chunk
+                    if chunk.text:
+                        emitted = True
+                        yield chunk.text
+            # Usage totals arrive on the final chunk
+            _record_usage(usage, "summary")
+
         except Exception as e:
             logger.error(f"Error generating response: {str(e)}")
-            return f"Query executed successfully. Found {len(db_results)} results."
+            if not emitted:
+                rows = sample[: summaries.TEMPLATE_MAX_ROWS]
+                yield summaries.template_summary(
+                    list(rows[0]) if rows else [],
+                    [tuple(row.values()) for row in rows],
+                    count,
+                )
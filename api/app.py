@@ -1,31 +1,371 @@
 import os
-from fastapi import FastAPI, HTTPException, Request
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, Literal
 from datetime import datetime
 import logging
 
+from admission import AdmissionController, AdmissionRejected, AdmissionTicket
 from ai_agent import AIAgent
 from database import DatabaseService
-from storage import StorageService
-from logging_config import setup_logging, get_logger, log_with_context
+from formats import (
+    ARROW,
+    ARROW_MEDIA_TYPE,
+    JSON,
+    arrow_available,
+    negotiate_format,
+    results_payload,
+    to_arrow_ipc,
+)
+from metrics import (
+    OPENMETRICS_CONTENT_TYPE,
+    PROMETHEUS_CONTENT_TYPE,
+    REGISTRY,
+    render,
+)
+from health import HealthMonitor
+from jobs import FINAL_STATUSES, JobManager, JobQueueFull
+from storage import QueryLogLookupUnavailable, StorageService
+from logging_config import (
+    setup_logging,
+    get_logger,
+    log_with_context,
+    logging_stats,
+)
 from middleware import RequestTracingMiddleware
+from model_scheduler import ModelUnavailableError
 
-setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+setup_logging(
+    os.getenv("LOG_LEVEL", "INFO"),
+    use_queue=os.getenv("LOG_ASYNC", "true").lower() == "true",
+    queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+    sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0")),
+)
 logger = get_logger(__name__)
 
-app = FastAPI(title="AI Agent Database Query API")
-app.add_middleware(RequestTracingMiddleware)
-
 db_service = DatabaseService()
 storage_service = StorageService()
 ai_agent = AIAgent(db_service=db_service, storage_service=storage_service)
 
+# Probes read cached results; the checks themselves run in the background.
+# Only the database gates readiness, storage failures just degrade logging.
+health_monitor = HealthMonitor(
+    checks={
+        "database": db_service.health_check,
+        "storage": storage_service.health_check,
+    },
+    critical=("database",),
+    interval_seconds=float(os.getenv("HEALTH_CHECK_INTERVAL", "10")),
+    timeout_seconds=float(os.getenv("HEALTH_CHECK_TIMEOUT", "3")),
+)
+
+
+async def _run_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Background counterpart of POST /query
+    """
+    result = await ai_agent.process_query(
+        query=payload["query"],
+        user_id=payload.get("user_id"),
+        context=payload.get("context"),
+        summary=payload.get("summary"),
+    )
+    await storage_service.log_query(
+        query=payload["query"],
+        response=result["response"],
+        user_id=payload.get("user_id"),
+        query_id=result["query_id"],
+    )
+    return _query_payload(result, payload.get("format") or JSON)
+
+
+# Long-running queries submitted through /jobs; at most JOB_WORKERS run
+# at once on this instance. Jobs keep running after the 202 response, so
+# they need CPU outside requests (Cloud Run cpu_idle = false) and are off
+# unless JOBS_ENABLED is set.
+jobs_enabled = os.getenv("JOBS_ENABLED", "false").lower() == "true"
+job_manager = JobManager(
+    run=_run_job,
+    store=storage_service,
+    workers=int(os.getenv("JOB_WORKERS", "2")),
+    max_queue=int(os.getenv("JOB_QUEUE_SIZE", "100")),
+    default_timeout=float(os.getenv("JOB_TIMEOUT", "600")),
+    max_timeout=float(os.getenv("JOB_MAX_TIMEOUT", "3600")),
+)
+
+# Fair sharing of this instance between callers of /query, /query/stream
+# and /query/batch; keep ADMISSION_MAX_IN_FLIGHT below the Cloud Run
+# container concurrency so excess load is shed here with a 429
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32")),
+    max_in_flight_per_user=int(os.getenv("ADMISSION_USER_MAX_IN_FLIGHT", "4")),
+    max_queue=int(os.getenv("ADMISSION_QUEUE_SIZE", "16")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2")),
+)
+
+# Retry-After sent with 503s when the model is unavailable
+MODEL_RETRY_AFTER = os.getenv("MODEL_RETRY_AFTER", "5")
+
+# Largest accepted /query/batch request
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "500"))
+
+# Seconds each warm-up step took at startup, exported as a gauge
+warm_up_timings: Dict[str, float] = {}
+
+
+def _register_metrics():
+    """
+    Expose service state that is tracked elsewhere as scrape-time metrics
+    """
+
+    def caches():
+        stats = {
+            "sql": ai_agent.sql_cache.stats(),
+            "sql_guard": db_service.sql_guard.stats(),
+        }
+        if db_service.result_cache is not None:
+            stats["result"] = db_service.result_cache.stats()
+        return stats
+
+    def per_cache(field):
+        return lambda: {(name,): s.get(field, 0) for name, s in caches().items()}
+
+    REGISTRY.callback(
+        "cache_hits_total", "Cache hits", per_cache("hits"), ["cache"], "counter"
+    )
+    REGISTRY.callback(
+        "cache_misses_total", "Cache misses", per_cache("misses"), ["cache"], "counter"
+    )
+    REGISTRY.callback(
+        "cache_hit_ratio",
+        "Cache hit ratio since start",
+        per_cache("hit_rate"),
+        ["cache"],
+    )
+    REGISTRY.callback(
+        "cache_entries", "Entries held per cache", per_cache("entries"), ["cache"]
+    )
+
+    def pool(field):
+        return lambda: db_service.get_pool_stats().get(field, 0)
+
+    for field in ("size", "checked_out", "idle", "overflow"):
+        REGISTRY.callback(f"db_pool_{field}", f"Connection pool {field}", pool(field))
+    REGISTRY.callback(
+        "db_pool_acquire_timeouts_total",
+        "Pool checkouts that timed out",
+        pool("acquire_timeouts"),
+        type="counter",
+    )
+
+    def replica(field):
+        return lambda: {
+            (name,): value[field] or 0
+            for name, value in db_service.replicas.stats().items()
+        }
+
+    REGISTRY.callback(
+        "db_replica_in_rotation",
+        "1 while the read replica receives reads",
+        replica("in_rotation"),
+        ["replica"],
+    )
+    REGISTRY.callback(
+        "db_replica_lag_seconds",
+        "Replay lag of the read replica at its latest check",
+        replica("lag_seconds"),
+        ["replica"],
+    )
+    REGISTRY.callback(
+        "db_replica_outstanding",
+        "Reads waiting for or holding a connection of the replica",
+        replica("outstanding"),
+        ["replica"],
+    )
+    REGISTRY.callback(
+        "db_replica_pool_checked_out",
+        "Connections checked out of the replica's pool",
+        replica("checked_out"),
+        ["replica"],
+    )
+
+    REGISTRY.callback(
+        "dependency_up",
+        "1 when the latest background health check passed",
+        lambda: {
+            (name,): int(check["ok"])
+            for name, check in health_monitor.snapshot().items()
+        },
+        ["dependency"],
+    )
+
+    def admitted(field):
+        return lambda: admission.stats()[field]
+
+    REGISTRY.callback(
+        "admission_in_flight", "Admitted /query requests running", admitted("in_flight")
+    )
+    REGISTRY.callback(
+        "admission_queued", "/query requests waiting for admission", admitted("queued")
+    )
+
+    def scheduler(field):
+        return lambda: ai_agent.scheduler.stats()[field]
+
+    REGISTRY.callback(
+        "model_concurrency_limit",
+        "Current adaptive limit on concurrent Gemini calls",
+        scheduler("limit"),
+    )
+    REGISTRY.callback(
+        "model_calls_in_flight", "Gemini calls in flight", scheduler("in_flight")
+    )
+    REGISTRY.callback(
+        "model_calls_queued",
+        "Gemini calls waiting for a concurrency slot",
+        scheduler("queued"),
+    )
+    REGISTRY.callback(
+        "jobs_in_progress",
+        "Background jobs queued or running on this instance",
+        lambda: {(state,): value for state, value in job_manager.stats().items()},
+        ["state"],
+    )
+    REGISTRY.callback(
+        "warm_up_seconds",
+        "Time each startup warm-up step took",
+        lambda: {(name,): seconds for name, seconds in warm_up_timings.items()},
+        ["step"],
+    )
+    REGISTRY.callback(
+        "log_records_dropped_total",
+        "Application log records dropped because the log queue was full",
+        lambda: logging_stats()["dropped"],
+        type="counter",
+    )
+    REGISTRY.callback(
+        "log_records_sampled_out_total",
+        "INFO/DEBUG log records skipped by LOG_SAMPLE_RATE",
+        lambda: logging_stats()["sampled_out"],
+        type="counter",
+    )
+
+    if storage_service.log_writer is not None:
+        writer = storage_service.log_writer
+        REGISTRY.callback(
+            "query_log_queued",
+            "Entries waiting in the log writer queue",
+            lambda: writer.stats()["queued"],
+        )
+        REGISTRY.callback(
+            "query_log_entries_total",
+            "Log entries by outcome",
+            lambda: {
+                (outcome,): writer.stats()[outcome]
+                for outcome in ("submitted", "dropped", "written", "failed")
+            },
+            ["outcome"],
+            "counter",
+        )
+
+
+_register_metrics()
+
+
+async def _warm_up():
+    """
+    Create clients and open connections in parallel before traffic arrives,
+    so a cold instance's first request does not pay for them. Failures are
+    logged and left to the first request (and the readiness probe).
+    """
+    timeout = float(os.getenv("WARMUP_TIMEOUT", "20"))
+    steps = {
+        "database": lambda: db_service.warm_up(
+            connections=int(os.getenv("WARMUP_DB_CONNECTIONS", "2")),
+            schema=os.getenv("WARMUP_SCHEMA", "true").lower() == "true",
+        ),
+        "storage": storage_service.warm_up,
+        "model": lambda: ai_agent.warm_up(
+            ping=os.getenv("WARMUP_MODEL_PING", "false").lower() == "true"
+        ),
+    }
+
+    async def run(name, step):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(step(), timeout)
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {str(e) or type(e).__name__}")
+        warm_up_timings[name] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(name, step) for name, step in steps.items()))
+    log_with_context(
+        logger,
+        logging.INFO,
+        "Startup warm-up finished",
+        duration_ms=round((time.perf_counter() - start) * 1000, 2),
+        extra_data={
+            name: round(seconds * 1000, 2) for name, seconds in warm_up_timings.items()
+        },
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv("STARTUP_WARMUP", "true").lower() == "true":
+        await _warm_up()
+    health_monitor.start()
+    db_service.start()
+    if jobs_enabled:
+        job_manager.start()
+    yield
+    await job_manager.stop()
+    await health_monitor.stop()
+    await storage_service.close()
+    await db_service.close()
+
+
+app = FastAPI(title="AI Agent Database Query API", lifespan=lifespan)
+app.add_middleware(RequestTracingMiddleware)
+
 
 class QueryRequest(BaseModel):
     query: str
     user_id: Optional[str] = None
     context: Optional[Dict[str, Any]] = None
+    # auto picks a template for empty or small results and the LLM
+    # otherwise; none returns the data without a summary
+    summary: Optional[Literal["auto", "llm", "template", "none"]] = None
+
+
+class BatchQueryItem(BaseModel):
+    query: str
+    context: Optional[Dict[str, Any]] = None
+    summary: Optional[Literal["auto", "llm", "template", "none"]] = None
+
+
+class BatchQueryRequest(BaseModel):
+    queries: List[BatchQueryItem]
+    user_id: Optional[str] = None
+    # Default for items that do not set their own
+    summary: Optional[Literal["auto", "llm", "template", "none"]] = None
+
+
+class JobRequest(QueryRequest):
+    priority: Literal["high", "normal", "low"] = "normal"
+    # Defaults to JOB_TIMEOUT, capped at JOB_MAX_TIMEOUT
+    timeout_seconds: Optional[float] = Field(None, gt=0)
+
+
+class CacheInvalidateRequest(BaseModel):
+    # Table names as in the catalog (lowercase unless created quoted)
+    tables: List[str] = Field(..., min_length=1)
 
 
 class QueryResponse(BaseModel):
@@ -33,6 +373,9 @@ class QueryResponse(BaseModel):
     data: Optional[Dict[str, Any]] = None
     query_id: str
     timestamp: str
+    # True when rows came from the result cache and may be up to
+    # RESULT_CACHE_TTL seconds old
+    cached: bool = False
 
 
 @app.get("/")
@@ -42,29 +385,91 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    try:
-        db_healthy = await db_service.health_check()
-        storage_healthy = storage_service.health_check()
-
-        return {
-            "status": "healthy" if db_healthy and storage_healthy else "degraded",
-            "database": "ok" if db_healthy else "error",
-            "storage": "ok" if storage_healthy else "error",
-            "timestamp": datetime.utcnow().isoformat(),
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        raise HTTPException(status_code=503, detail="Service unavailable")
+    """
+    Dependency status from the background health monitor (no I/O)
+    """
+    checks = health_monitor.snapshot()
+    db_healthy = checks.get("database", {}).get("ok", False)
+    storage_healthy = checks.get("storage", {}).get("ok", False)
+
+    return {
+        "status": "healthy" if db_healthy and storage_healthy else "degraded",
+        "database": "ok" if db_healthy else "error",
+        "storage": "ok" if storage_healthy else "error",
+        "checks": checks,
+        "pool": db_service.get_pool_stats(),
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
+@app.get("/health/live")
+async def liveness():
+    """
+    Liveness probe: the process is up and serving requests
+    """
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """
+    Readiness probe: critical dependencies passed their latest background
+    check
+    """
+    if not health_monitor.is_ready():
+        return JSONResponse(
+            status_code=503,
+            content={"status": "not ready", "checks": health_monitor.snapshot()},
+        )
+    return {"status": "ready"}
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    """
+    Prometheus text format, or OpenMetrics when the scraper asks for it
+    """
+    openmetrics = "application/openmetrics-text" in request.headers.get("accept", "")
+    return Response(
+        content=render(REGISTRY, openmetrics=openmetrics),
+        media_type=OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE,
+    )
+
+
+def _query_payload(result: Dict[str, Any], fmt: str) -> Dict[str, Any]:
+    """
+    QueryResponse fields for an AIAgent.process_query result
+    """
+    data = result.get("data", {})
+    return {
+        "response": result["response"],
+        "data": {"results": results_payload(result["result_set"], fmt), **data},
+        "query_id": result["query_id"],
+        "timestamp": result["timestamp"],
+        "cached": data.get("cached", False),
+    }
 
 
 @app.post("/query", response_model=QueryResponse)
-async def process_query(request_body: QueryRequest, request: Request):
+async def process_query(
+    request_body: QueryRequest,
+    request: Request,
+    result_format: Optional[str] = Query(None, alias="format"),
+):
     """
-    Process user query through AI agent and return results from database
+    Process user query through AI agent and return results from database.
+    Results are row-oriented JSON by default; ?format=columnar or
+    ?format=arrow (or the matching Accept header) selects column-major JSON
+    or an Arrow IPC stream.
     """
     request_id = getattr(request.state, "request_id", "unknown")
+    ticket = await _admit(request, request_body.user_id)
 
     try:
+        fmt = negotiate_format(request.headers.get("accept", ""), result_format)
+        if fmt == ARROW and not arrow_available():
+            raise HTTPException(status_code=406, detail="Arrow format not available")
+
         log_with_context(
             logger,
             logging.INFO,
@@ -77,12 +482,14 @@ async def process_query(request_body: QueryRequest, request: Request):
             query=request_body.query,
             user_id=request_body.user_id,
             context=request_body.context,
+            summary=request_body.summary,
         )
 
         await storage_service.log_query(
             query=request_body.query,
             response=result["response"],
             user_id=request_body.user_id,
+            query_id=result["query_id"],
         )
 
         log_with_context(
@@ -97,13 +504,41 @@ async def process_query(request_body: QueryRequest, request: Request):
             },
         )
 
-        return QueryResponse(
-            response=result["response"],
-            data=result.get("data"),
-            query_id=result["query_id"],
-            timestamp=result["timestamp"],
-        )
+        data = result.get("data", {})
+        result_set = result["result_set"]
+
+        if fmt == ARROW:
+            return Response(
+                content=to_arrow_ipc(
+                    result_set,
+                    metadata={
+                        "response": result["response"],
+                        "query_id": result["query_id"],
+                        "timestamp": result["timestamp"],
+                        **data,
+                    },
+                ),
+                media_type=ARROW_MEDIA_TYPE,
+                headers={"X-Query-ID": result["query_id"]},
+            )
+
+        return QueryResponse(**_query_payload(result, fmt))
 
+    except HTTPException:
+        raise
+    except ModelUnavailableError as e:
+        log_with_context(
+            logger,
+            logging.ERROR,
+            f"Model unavailable: {str(e)}",
+            request_id=request_id,
+            user_id=request_body.user_id,
+        )
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": MODEL_RETRY_AFTER},
+        )
     except ValueError as e:
         log_with_context(
             logger,
@@ -122,6 +557,335 @@ async def process_query(request_body: QueryRequest, request: Request):
             user_id=request_body.user_id,
         )
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        ticket.release()
+
+
+def _caller_key(request: Request, user_id: Optional[str]) -> str:
+    """
+    Admission key: the user_id, or the client address for anonymous calls.
+    The address is the last X-Forwarded-For entry, the one appended by the
+    Cloud Run front end; earlier entries are whatever the client sent.
+    """
+    if user_id:
+        return f"user:{user_id}"
+    forwarded = request.headers.get("x-forwarded-for", "").split(",")[-1].strip()
+    return f"ip:{forwarded or (request.client.host if request.client else '')}"
+
+
+async def _admit(request: Request, user_id: Optional[str]) -> AdmissionTicket:
+    """
+    Take an admission slot for the caller, or fail with 429 before any
+    schema, model or database work starts
+    """
+    try:
+        return await admission.acquire(_caller_key(request, user_id))
+    except AdmissionRejected as e:
+        log_with_context(
+            logger,
+            logging.WARNING,
+            f"Request rejected ({e.reason}): {str(e)}",
+            request_id=getattr(request.state, "request_id", "unknown"),
+            user_id=user_id,
+        )
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that gives back its admission slot when the response
+    ends, including when the client disconnects before the body starts
+    """
+
+    def __init__(self, content, ticket: AdmissionTicket, **kwargs):
+        super().__init__(content, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.ticket.release()
+
+
+def _error_detail(error: Exception) -> str:
+    """
+    Message safe to show clients for a failed query
+    """
+    if isinstance(error, (ValueError, ModelUnavailableError)):
+        return str(error)
+    return "Internal server error"
+
+
+def _encode_event(event: Dict[str, Any], sse: bool) -> str:
+    payload = json.dumps(event, default=str)
+    if sse:
+        return f"event: {event['event']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+@app.post("/query/stream")
+async def process_query_stream(request_body: QueryRequest, request: Request):
+    """
+    Process user query and stream the SQL, rows and summary as they become
+    available. Emits NDJSON by default, or SSE when the client accepts
+    text/event-stream.
+    """
+    request_id = getattr(request.state, "request_id", "unknown")
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    ticket = await _admit(request, request_body.user_id)
+
+    log_with_context(
+        logger,
+        logging.INFO,
+        f"Processing streaming query: {request_body.query[:100]}...",
+        request_id=request_id,
+        user_id=request_body.user_id,
+    )
+
+    async def events():
+        summary = []
+        query_id = None
+        try:
+            async for event in ai_agent.process_query_stream(
+                query=request_body.query,
+                user_id=request_body.user_id,
+                context=request_body.context,
+                summary=request_body.summary,
+            ):
+                if event["event"] == "sql":
+                    query_id = event["query_id"]
+                elif event["event"] == "summary":
+                    summary.append(event["text"])
+                yield _encode_event(event, sse)
+
+        except Exception as e:
+            log_with_context(
+                logger,
+                logging.ERROR,
+                f"Error streaming query: {str(e)}",
+                request_id=request_id,
+                user_id=request_body.user_id,
+            )
+            detail = _error_detail(e)
+            yield _encode_event({"event": "error", "detail": detail}, sse)
+            return
+
+        await storage_service.log_query(
+            query=request_body.query,
+            response="".join(summary),
+            user_id=request_body.user_id,
+            query_id=query_id,
+        )
+
+    return AdmittedStreamingResponse(
+        events(),
+        ticket=ticket,
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+    )
+
+
+def _batch_item(index: int, result, fmt: str) -> Dict[str, Any]:
+    """
+    One /query/batch result: the /query response fields, or the error
+    """
+    if isinstance(result, Exception):
+        return {"index": index, "status": "error", "detail": _error_detail(result)}
+
+    return {"index": index, "status": "ok", **_query_payload(result, fmt)}
+
+
+@app.post("/query/batch")
+async def process_query_batch(
+    request_body: BatchQueryRequest,
+    request: Request,
+    result_format: Optional[str] = Query(None, alias="format"),
+):
+    """
+    Process many queries in one call. Items share a schema snapshot, run
+    concurrently (see BATCH_MODEL_CONCURRENCY and BATCH_DB_CONCURRENCY)
+    and are logged together at the end. Returns the results in request
+    order, or streams each one as it completes (NDJSON or SSE, by Accept
+    header). A failed item does not fail the batch.
+    """
+    request_id = getattr(request.state, "request_id", "unknown")
+    accept = request.headers.get("accept", "")
+    sse = "text/event-stream" in accept
+    stream = sse or "application/x-ndjson" in accept
+
+    count = len(request_body.queries)
+    if not count or count > BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch must contain between 1 and {BATCH_MAX_QUERIES} queries",
+        )
+    try:
+        fmt = negotiate_format("" if stream else accept, result_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if fmt == ARROW:
+        raise HTTPException(status_code=406, detail="Arrow format not available")
+
+    # The whole batch takes one slot; its items are bounded by the batch limits
+    ticket = await _admit(request, request_body.user_id)
+
+    log_with_context(
+        logger,
+        logging.INFO,
+        f"Processing batch of {count} queries",
+        request_id=request_id,
+        user_id=request_body.user_id,
+    )
+
+    async def results():
+        logs = []
+        async for index, result in ai_agent.process_batch(
+            [item.model_dump() for item in request_body.queries],
+            user_id=request_body.user_id,
+            summary=request_body.summary,
+        ):
+            item = _batch_item(index, result, fmt)
+            if item["status"] == "ok":
+                logs.append(
+                    {
+                        "query": request_body.queries[index].query,
+                        "response": item["response"],
+                        "user_id": request_body.user_id,
+                        "query_id": item["query_id"],
+                    }
+                )
+            else:
+                log_with_context(
+                    logger,
+                    logging.ERROR,
+                    f"Batch item {index} failed: {str(result)}",
+                    request_id=request_id,
+                    user_id=request_body.user_id,
+                )
+            yield item
+
+        await storage_service.log_queries(logs)
+        log_with_context(
+            logger,
+            logging.INFO,
+            "Batch processed",
+            request_id=request_id,
+            user_id=request_body.user_id,
+            extra_data={"count": count, "errors": count - len(logs)},
+        )
+
+    if stream:
+
+        async def events():
+            errors = 0
+            async for item in results():
+                errors += item["status"] == "error"
+                yield _encode_event({"event": "result", **item}, sse)
+            yield _encode_event(
+                {"event": "done", "count": count, "errors": errors}, sse
+            )
+
+        return AdmittedStreamingResponse(
+            events(),
+            ticket=ticket,
+            media_type="text/event-stream" if sse else "application/x-ndjson",
+        )
+
+    items = [None] * count
+    try:
+        async for item in results():
+            items[item["index"]] = item
+    finally:
+        ticket.release()
+    return {
+        "results": items,
+        "count": count,
+        "errors": sum(item["status"] == "error" for item in items),
+    }
+
+
+def _job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Job record as returned to clients (without the original request)
+    """
+    return {key: value for key, value in job.items() if key != "request"}
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    request_body: JobRequest,
+    request: Request,
+    result_format: Optional[str] = Query(None, alias="format"),
+):
+    """
+    Queue a query to run in the background and return its job ID at once.
+    Poll GET /jobs/{job_id} for the status and, once it succeeded, the
+    same result /query returns (JSON or columnar).
+    """
+    if not jobs_enabled:
+        raise HTTPException(status_code=404, detail="Background jobs are disabled")
+
+    request_id = getattr(request.state, "request_id", "unknown")
+
+    try:
+        fmt = negotiate_format("", result_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if fmt == ARROW:
+        raise HTTPException(status_code=406, detail="Arrow format not available")
+
+    payload = request_body.model_dump(exclude={"priority", "timeout_seconds"})
+    payload["format"] = fmt
+    try:
+        job = await job_manager.submit(
+            payload,
+            priority=request_body.priority,
+            timeout=request_body.timeout_seconds,
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    log_with_context(
+        logger,
+        logging.INFO,
+        f"Job queued: {request_body.query[:100]}...",
+        request_id=request_id,
+        user_id=request_body.user_id,
+        extra_data={"job_id": job["job_id"], "priority": job["priority"]},
+    )
+    return _job_status(job)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Status of a background job, with its result once it succeeded
+    """
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_status(job)
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued or running job
+    """
+    job = await job_manager.cancel(job_id)
+    if job is not None:
+        return _job_status(job)
+
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in FINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    raise HTTPException(status_code=409, detail="Job is running on another instance")
 
 
 @app.get("/queries/{query_id}")
@@ -134,6 +898,8 @@ async def get_query_result(query_id: str):
         if not result:
             raise HTTPException(status_code=404, detail="Query not found")
         return result
+    except QueryLogLookupUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
@@ -141,6 +907,22 @@ async def get_query_result(query_id: str):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@app.post("/admin/cache/invalidate")
+async def invalidate_result_cache(request: CacheInvalidateRequest):
+    """
+    Drop cached results that read any of the given tables, e.g. after an
+    out-of-band data load. Not routed by the API Gateway; call the Cloud
+    Run service directly with an identity that has run.invoker.
+    """
+    if db_service.result_cache is None:
+        raise HTTPException(status_code=404, detail="Result cache is disabled")
+
+    tables = sorted(set(request.tables))
+    if not await db_service.invalidate_results(tables):
+        raise HTTPException(status_code=503, detail="Result cache unavailable")
+    return {"invalidated": tables}
+
+
 if __name__ == "__main__":
     import uvicorn
 
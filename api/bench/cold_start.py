@@ -0,0 +1,83 @@
+"""
+Import time and first-request latency of a fresh process.
+
+Each round starts a new interpreter that imports app, optionally runs the
+startup warm-up, then times its first and second /query. The database
+and model calls are stubbed, but google.genai is really imported and its
+client created, since that is most of a cold start. Without warm-up the
+first request pays for it; with warm-up it is paid before traffic.
+
+    python -m bench.cold_start --rounds 5
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+def child(warm_up: bool) -> None:
+    start = time.perf_counter()
+    from bench.stubs import load_app
+
+    app_module = load_app(model_latency=0, db_latency=0, real_sdk=True)
+    result = {"import_ms": (time.perf_counter() - start) * 1000}
+
+    async def run():
+        from bench.stubs import run_load
+
+        if warm_up:
+            start = time.perf_counter()
+            await app_module._warm_up()
+            result["warm_up_ms"] = (time.perf_counter() - start) * 1000
+        for name in ("first_ms", "second_ms"):
+            stats = await run_load(
+                app_module.app,
+                "POST",
+                "/query",
+                lambda i, name=name: {"query": f"{name} question"},
+                1,
+                1,
+            )
+            result[name] = stats["p50_ms"]
+
+    asyncio.run(run())
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--child", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child == "warm")
+        return
+
+    fields = ["import_ms", "warm_up_ms", "first_ms", "second_ms"]
+    print(f"{'median':>16}" + "".join(f"{f:>12}" for f in fields))
+    for mode in ("cold", "warm"):
+        runs = []
+        for _ in range(args.rounds):
+            output = subprocess.run(
+                [sys.executable, "-m", "bench.cold_start", "--child", mode],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            # Log lines of the child's app share its stdout
+            line = next(x for x in output.splitlines() if x.startswith('{"import_ms"'))
+            runs.append(json.loads(line))
+        row = f"{'no warm-up' if mode == 'cold' else 'warm-up':>16}"
+        for field in fields:
+            values = [run[field] for run in runs if field in run]
+            row += f"{statistics.median(values):>12.1f}" if values else f"{'-':>12}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Per-request logging cost of /query under load.
+
+Runs the stubbed /query with zero backend latency, so each request costs
+only CPU on the event loop, once with logging at WARNING (no per-request
+records) and then with INFO records through each logging setup: a
+synchronous stdout handler (the old behaviour), the queue handler with
+its writer thread, and the queue handler with sampling. The difference
+in time per request against the WARNING run is the logging cost.
+
+    python -m bench.logging_cost
+    python -m bench.logging_cost --write-delay-us 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from bench.stubs import load_app, run_load
+
+
+class SlowWriter:
+    """
+    File wrapper whose writes block for delay seconds
+    """
+
+    def __init__(self, file, delay: float):
+        self.file = file
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        return self.file.write(text)
+
+    def flush(self) -> None:
+        self.file.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--rounds", type=int, default=3, help="best of")
+    parser.add_argument(
+        "--output", help="where log lines go (default: a temporary file)"
+    )
+    parser.add_argument(
+        "--write-delay-us",
+        type=float,
+        default=0,
+        help="block each write this long, like a stdout pipe the log agent "
+        "drains slowly",
+    )
+    args = parser.parse_args()
+
+    app = load_app(model_latency=0, db_latency=0).app
+    from logging_config import logging_stats, setup_logging, shutdown_logging
+
+    output = SlowWriter(
+        open(args.output or tempfile.mktemp(suffix=".log"), "w"),
+        args.write_delay_us / 1e6,
+    )
+    modes = [
+        ("no records", dict(log_level="WARNING", use_queue=False)),
+        ("sync stdout", dict(log_level="INFO", use_queue=False)),
+        ("queue", dict(log_level="INFO", use_queue=True)),
+        (
+            f"queue, {args.sample_rate:g} sampled",
+            dict(log_level="INFO", use_queue=True, sample_rate=args.sample_rate),
+        ),
+    ]
+
+    print(f"{'':>20} {'req/s':>8} {'us/req':>8} {'logging us/req':>15} {'dropped':>8}")
+    # The first mode gets an extra round that warms up the process
+    baseline = None
+    for label, options in modes:
+        # Handlers write to sys.stdout as it is when logging is set up
+        sys.stdout = output
+        setup_logging(**options)
+        try:
+            rps = max(
+                asyncio.run(
+                    run_load(
+                        app,
+                        "POST",
+                        "/query",
+                        # Distinct questions, so the SQL cache never hits
+                        lambda i, m=f"{label} {r}": {
+                            "query": f"{m} {i}",
+                            "user_id": f"u{i}",
+                        },
+                        args.requests,
+                        args.concurrency,
+                    )
+                )["rps"]
+                for r in range(args.rounds + (baseline is None))
+            )
+            dropped = logging_stats()["dropped"]
+        finally:
+            shutdown_logging()
+            sys.stdout = sys.__stdout__
+
+        per_request = 1e6 / rps
+        baseline = per_request if baseline is None else baseline
+        print(
+            f"{label:>20} {rps:>8.0f} {per_request:>8.0f}"
+            f" {per_request - baseline:>15.0f} {dropped:>8}"
+        )
+
+    output.file.close()
+    if not args.output:
+        os.unlink(output.file.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Requests per second through the request tracing middleware.
+
+Compares, on /health and the stubbed /query, the app without tracing
+middleware, with a BaseHTTPMiddleware version of RequestTracingMiddleware
+(as it was before the plain ASGI rewrite) and with the current one.
+
+    python -m bench.middleware_rps
+    LOG_LEVEL=INFO python -m bench.middleware_rps | grep -v '^{'
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from bench.stubs import load_app, run_load
+
+
+class BaseHTTPTracingMiddleware(BaseHTTPMiddleware):
+    """
+    RequestTracingMiddleware on BaseHTTPMiddleware: same request ID,
+    timing headers and log lines, with the log arguments built eagerly
+    """
+
+    async def dispatch(self, request, call_next):
+        from logging_config import log_with_context, set_request_id
+        from metrics import server_timing, start_timings
+
+        logger = logging.getLogger("middleware")
+        request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
+        request.state.request_id = request_id
+        set_request_id(request_id)
+        start_time = time.perf_counter()
+        timings = start_timings()
+
+        log_with_context(
+            logger,
+            logging.INFO,
+            f"Request started: {request.method} {request.url.path}",
+            request_id=request_id,
+            extra_data={
+                "method": request.method,
+                "path": request.url.path,
+                "query_params": str(request.query_params),
+            },
+        )
+
+        response = await call_next(request)
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        log_with_context(
+            logger,
+            logging.INFO,
+            f"Request completed: {request.method} {request.url.path}",
+            request_id=request_id,
+            duration_ms=round(duration_ms, 2),
+            status_code=response.status_code,
+        )
+        response.headers["X-Request-ID"] = request_id
+        response.headers["X-Response-Time-Ms"] = str(round(duration_ms, 2))
+        response.headers["Server-Timing"] = server_timing(timings, duration_ms)
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=3, help="best of")
+    args = parser.parse_args()
+
+    app_module = load_app(model_latency=0, db_latency=0)
+    from middleware import RequestTracingMiddleware
+
+    app = app_module.app
+    variants = [
+        ("none", []),
+        ("BaseHTTPMiddleware", [Middleware(BaseHTTPTracingMiddleware)]),
+        ("plain ASGI", [Middleware(RequestTracingMiddleware)]),
+    ]
+    endpoints = [
+        ("GET /health", "GET", "/health", lambda tag, i: None),
+        (
+            "POST /query",
+            "POST",
+            "/query",
+            # Distinct questions, so the SQL cache never hits
+            lambda tag, i: {"query": f"{tag} {i}", "user_id": f"u{i}"},
+        ),
+    ]
+
+    print(f"{'':>20}" + "".join(f"{label:>14}" for label, *_ in endpoints))
+    for variant, middleware in variants:
+        app.user_middleware = middleware
+        # Rebuilt with the new middleware on the next request
+        app.middleware_stack = None
+        row = f"{variant:>20}"
+        for _, method, path, payload in endpoints:
+            rps = max(
+                asyncio.run(
+                    run_load(
+                        app,
+                        method,
+                        path,
+                        lambda i, p=payload, tag=f"{variant} {r}": p(tag, i),
+                        args.requests,
+                        args.concurrency,
+                    )
+                )["rps"]
+                for r in range(args.rounds)
+            )
+            row += f"{rps:>14.0f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
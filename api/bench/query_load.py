@@ -0,0 +1,55 @@
+"""
+Load test for POST /query with stubbed backends.
+
+Each request waits on one model call and one database query. While those
+waits do not block the event loop, throughput grows with the number of
+concurrent requests (up to concurrency / (model + database latency));
+--blocking makes the model call a time.sleep to show the serialized
+baseline a synchronous SDK call gives.
+
+    python -m bench.query_load --concurrency 1,8,32,80
+"""
+
+import argparse
+import asyncio
+
+from bench.stubs import load_app, run_load
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--concurrency", default="1,8,32,80")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--model-latency", type=float, default=0.2)
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    parser.add_argument("--blocking", action="store_true")
+    args = parser.parse_args()
+
+    app = load_app(args.model_latency, args.db_latency, args.blocking).app
+    per_request = args.model_latency + args.db_latency
+
+    print(f"{'concurrency':>11} {'req/s':>8} {'ideal':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        stats = asyncio.run(
+            run_load(
+                app,
+                "POST",
+                "/query",
+                # Distinct questions, so neither the SQL nor the result cache hits
+                lambda i, c=concurrency: {
+                    "query": f"question {c}-{i}",
+                    "user_id": f"u{i}",
+                },
+                max(args.requests, concurrency),
+                concurrency,
+            )
+        )
+        print(
+            f"{concurrency:>11} {stats['rps']:>8.1f} {concurrency / per_request:>8.1f}"
+            f" {stats['p50_ms']:>8.1f} {stats['p99_ms']:>8.1f}"
+            + (f"  ({stats['errors']} errors)" if stats["errors"] else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
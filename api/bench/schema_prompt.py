@@ -0,0 +1,144 @@
+"""
+Schema context size and cost per question, full dump versus pruned DDL.
+
+Builds a synthetic warehouse schema and, for a set of questions, compares
+the old prompt (the whole schema as indented JSON) with what SchemaIndex
+selects under SCHEMA_PROMPT_TOKEN_BUDGET. Reports estimated prompt tokens,
+the time to build the schema context, and how often the table a question
+is about made it into the pruned prompt.
+
+    python -m bench.schema_prompt --tables 400 --budget 4000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from schema_context import SchemaIndex, estimate_tokens
+
+DOMAINS = [
+    "customer", "order", "product", "invoice", "shipment", "payment",
+    "supplier", "employee", "warehouse", "campaign", "ticket", "contract",
+    "store", "region", "account", "subscription", "refund", "review",
+    "inventory", "vendor", "device", "session", "coupon", "carrier",
+]  # fmt: skip
+VARIANTS = [
+    "", "_history", "_event", "_daily", "_snapshot", "_audit", "_staging",
+    "_archive", "_summary", "_line", "_note", "_tag", "_attribute", "_link",
+    "_metric", "_forecast", "_backup",
+]  # fmt: skip
+COLUMN_WORDS = [
+    "amount", "status", "created_at", "updated_at", "quantity", "price",
+    "currency", "country", "city", "channel", "source", "score", "weight",
+    "priority", "category", "discount", "tax", "total", "name", "email",
+    "phone", "code", "description", "started_at", "ended_at", "is_active",
+]  # fmt: skip
+COLUMN_TYPES = ["INTEGER", "NUMERIC(12,2)", "TEXT", "TIMESTAMP", "BOOLEAN"]
+
+
+def synthetic_schema(tables: int, seed: int = 0):
+    rng = random.Random(seed)
+    names = [f"{d}{v}" for v in VARIANTS for d in DOMAINS][:tables]
+    schema = {}
+    for name in names:
+        domain = next(d for d in DOMAINS if name.startswith(d))
+        columns = [{"name": "id", "type": "INTEGER", "nullable": False}]
+        foreign_keys = []
+        if name != domain:
+            columns.append(
+                {"name": f"{domain}_id", "type": "INTEGER", "nullable": False}
+            )
+            foreign_keys.append(
+                {
+                    "constrained_columns": [f"{domain}_id"],
+                    "referred_table": domain,
+                    "referred_columns": ["id"],
+                }
+            )
+        for word in rng.sample(COLUMN_WORDS, rng.randint(8, 24)):
+            columns.append(
+                {
+                    "name": word,
+                    "type": rng.choice(COLUMN_TYPES),
+                    "nullable": rng.random() < 0.7,
+                    "comment": f"{word.replace('_', ' ')} of the {domain}"
+                    if rng.random() < 0.3
+                    else None,
+                }
+            )
+        schema[name] = {
+            "columns": columns,
+            "primary_key": {"constrained_columns": ["id"]},
+            "foreign_keys": foreign_keys,
+            "comment": f"{name.replace('_', ' ')} records",
+        }
+    return schema
+
+
+def questions(schema, count: int, seed: int = 1):
+    """
+    (question, table it is about) pairs
+    """
+    rng = random.Random(seed)
+    templates = [
+        "total {column} per {table} last month",
+        "which {table} has the highest {column}",
+        "show {table} records where {column} is missing",
+        "average {column} by {table} status",
+    ]
+    result = []
+    for _ in range(count):
+        table = rng.choice(list(schema))
+        column = rng.choice(schema[table]["columns"][1:])["name"]
+        text = rng.choice(templates).format(
+            table=table.replace("_", " "), column=column.replace("_", " ")
+        )
+        result.append((text, table))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--tables", type=int, default=400)
+    parser.add_argument("--budget", type=int, default=4000)
+    parser.add_argument("--questions", type=int, default=200)
+    args = parser.parse_args()
+
+    schema = synthetic_schema(args.tables)
+    start = time.perf_counter()
+    index = SchemaIndex(schema)
+    build_ms = (time.perf_counter() - start) * 1000
+    sample = questions(schema, args.questions)
+
+    full_tokens, full_ms = [], []
+    pruned_tokens, pruned_ms, found = [], [], 0
+    for question, table in sample:
+        start = time.perf_counter()
+        full = json.dumps(schema, indent=2)
+        full_ms.append((time.perf_counter() - start) * 1000)
+        full_tokens.append(estimate_tokens(full))
+
+        start = time.perf_counter()
+        pruned = index.select(question, args.budget)
+        pruned_ms.append((time.perf_counter() - start) * 1000)
+        pruned_tokens.append(estimate_tokens(pruned))
+        found += f"CREATE TABLE {table} (" in pruned
+
+    print(f"{len(schema)} tables, {args.questions} questions, budget {args.budget}")
+    print(f"index build: {build_ms:.1f} ms once per schema snapshot")
+    print(f"{'':>14} {'tokens p50':>11} {'tokens max':>11} {'ms p50':>8} {'ms max':>8}")
+    for label, tokens, ms in (
+        ("full JSON", full_tokens, full_ms),
+        ("pruned DDL", pruned_tokens, pruned_ms),
+    ):
+        print(
+            f"{label:>14} {statistics.median(tokens):>11.0f} {max(tokens):>11}"
+            f" {statistics.median(ms):>8.2f} {max(ms):>8.2f}"
+        )
+    print(f"target table in pruned prompt: {found / len(sample):.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,158 @@
 import os
+import time
+import asyncio
 import logging
-from typing import List, Dict, Any
-from sqlalchemy import create_engine, text, inspect
-from sqlalchemy.pool import NullPool
-from google.cloud.sql.connector import Connector
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+from sqlalchemy import text, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from cache import LRUCache
+from metrics import REGISTRY, record_stage, stage
+from replicas import READS, ReplicaSet
+from result_cache import (
+    InProcessBackend,
+    RedisStore,
+    ResultCache,
+    SharedStoreBackend,
+)
+from result_set import ResultSet, row_size
+from schema_cache import SchemaCache, SchemaSnapshot
+from sql_guard import SQLGuard, SQLGuardError, plan_estimates
+from sql_utils import parameterize_sql, referenced_tables, sql_fingerprint
 
 logger = logging.getLogger(__name__)
 
+# Cheap catalog hash used to detect DDL changes without a full introspection
+SCHEMA_FINGERPRINT_SQL = """
+SELECT md5(coalesce(string_agg(
+    table_name || '.' || column_name || ':' || data_type || ':' || is_nullable,
+    ',' ORDER BY table_name, ordinal_position
+), ''))
+FROM information_schema.columns
+WHERE table_schema = current_schema()
+"""
+
+STATEMENTS = REGISTRY.counter(
+    "db_statements_total",
+    "Statements executed as a parameterized template (prepared) or as literal SQL",
+    ["mode"],
+)
+
+
+def _split_list(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
 
 class DatabaseService:
     """
-    Database service supporting both Cloud SQL and direct connections
+    Database service supporting both Cloud SQL and direct connections.
+
+    Besides the primary engine it can hold read replicas, each with its
+    own pool. Generated queries (always single read-only SELECTs) and
+    schema introspection are served by the replicas when any is in
+    rotation, by the primary otherwise.
     """
 
     def __init__(self):
         self.db_type = os.getenv("DB_TYPE", "cloudsql")  # cloudsql or postgres
         self.engine = None
         self.connector = None
+        self._connector_lock = asyncio.Lock()
+
+        self.pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+        self.max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+        self.pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+        self.pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        self.pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+        self.replica_pool_size = int(
+            os.getenv("DB_REPLICA_POOL_SIZE", str(self.pool_size))
+        )
+
+        # Replicas failing their check or lagging more than this many
+        # seconds behind the primary are taken out of rotation
+        self.replicas = ReplicaSet(
+            max_lag_seconds=float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "30")),
+            interval_seconds=float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5")),
+            timeout_seconds=float(os.getenv("DB_REPLICA_CHECK_TIMEOUT", "3")),
+        )
+
+        # Hard caps on what a single query may pull into memory
+        self.max_rows = int(os.getenv("DB_MAX_ROWS", "1000"))
+        self.max_bytes = int(os.getenv("DB_MAX_BYTES", str(8 * 1024 * 1024)))
+        self.fetch_batch_size = int(os.getenv("DB_FETCH_BATCH_SIZE", "100"))
+
+        # Server-side guards: per-statement timeout and EXPLAIN thresholds
+        # (0 disables the plan check)
+        self.statement_timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+        self.max_plan_cost = float(os.getenv("SQL_MAX_PLAN_COST", "0"))
+        self.max_plan_rows = float(os.getenv("SQL_MAX_PLAN_ROWS", "0"))
+
+        # One row past the cap so truncation is still detected
+        self.sql_guard = SQLGuard(max_limit=self.max_rows + 1)
+
+        # Statements whose literals were parameterized run as one shared
+        # template once it has been seen this often (0 disables). asyncpg
+        # keeps the prepared statement per pooled connection, so hot shapes
+        # skip parsing and planning.
+        self.prepare_threshold = int(os.getenv("DB_PREPARE_THRESHOLD", "2"))
+        self._template_hits = LRUCache(max_entries=1024)
+        self._literal_templates = LRUCache(max_entries=1024)
+
+        self._acquire_count = 0
+        self._acquire_timeouts = 0
+        self._wait_total_ms = 0.0
+        self._wait_max_ms = 0.0
+
+        self.schema_cache = SchemaCache(
+            loader=self._load_schema,
+            fingerprinter=self._schema_fingerprint,
+            ttl_seconds=float(os.getenv("SCHEMA_CACHE_TTL", "300")),
+            max_columns=int(os.getenv("SCHEMA_PROMPT_MAX_COLUMNS", "40")),
+            on_change=self._on_schema_change,
+        )
+
+        self.result_cache = self._create_result_cache(
+            os.getenv("RESULT_CACHE_BACKEND", "memory")
+        )
+
         self._initialize_connection()
 
+    def _create_result_cache(self, backend: str) -> Optional[ResultCache]:
+        """
+        Result cache for RESULT_CACHE_BACKEND: memory (per instance), shared
+        (Redis/Memorystore at RESULT_CACHE_REDIS_URL, shared by instances)
+        or none
+        """
+        if backend == "none":
+            return None
+
+        if backend == "memory":
+            store = InProcessBackend(
+                max_bytes=int(
+                    os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))
+                )
+            )
+        elif backend == "shared":
+            redis_url = os.getenv("RESULT_CACHE_REDIS_URL")
+            if not redis_url:
+                raise ValueError(
+                    "RESULT_CACHE_REDIS_URL environment variable required "
+                    "for RESULT_CACHE_BACKEND=shared"
+                )
+            store = SharedStoreBackend(RedisStore(redis_url))
+        else:
+            raise ValueError(
+                f"Unknown RESULT_CACHE_BACKEND {backend!r} "
+                "(expected memory, shared or none)"
+            )
+
+        return ResultCache(
+            store, ttl_seconds=float(os.getenv("RESULT_CACHE_TTL", "60"))
+        )
+
     def _initialize_connection(self):
         """
         Initialize database connection based on configuration
@@ -29,118 +163,547 @@ class DatabaseService:
             else:
                 self._init_postgres()
 
-            logger.info(f"Database connection initialized: {self.db_type}")
+            logger.info(
+                f"Database connection initialized: {self.db_type}, "
+                f"{len(self.replicas)} read replica(s)"
+            )
 
         except Exception as e:
             logger.error(f"Failed to initialize database: {str(e)}")
             raise
 
+    def _pool_options(self, replica: bool = False) -> Dict[str, Any]:
+        """
+        Connection pool settings shared by every engine
+        """
+        return {
+            "pool_size": self.replica_pool_size if replica else self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+        }
+
+    def _connect_args(self) -> Dict[str, Any]:
+        """
+        asyncpg connection arguments. Settings are applied as session
+        defaults so they cost no extra round trip per query: sessions are
+        read-only, since the app only runs generated queries, and string
+        literals are parsed the way SQLGuard tokenizes them.
+        """
+        settings = {
+            "default_transaction_read_only": "on",
+            "standard_conforming_strings": "on",
+        }
+        if self.statement_timeout_ms:
+            settings["statement_timeout"] = str(self.statement_timeout_ms)
+        return {"server_settings": settings}
+
     def _init_cloud_sql(self):
         """
-        Initialize Cloud SQL connection using Cloud SQL Python Connector
+        Initialize Cloud SQL connection using Cloud SQL Python Connector.
+        Read replicas (CLOUD_SQL_REPLICAS, instance connection names) share
+        the primary's credentials and connector.
         """
         instance_connection_name = os.getenv("CLOUD_SQL_INSTANCE")
+        if not instance_connection_name:
+            raise ValueError("CLOUD_SQL_INSTANCE environment variable required")
+
+        self.engine = self._cloud_sql_engine(
+            instance_connection_name, self._pool_options()
+        )
+        for name in _split_list(os.getenv("CLOUD_SQL_REPLICAS")):
+            self.replicas.add(
+                name, self._cloud_sql_engine(name, self._pool_options(replica=True))
+            )
+
+    def _cloud_sql_engine(self, instance_connection_name: str, pool_options):
         db_user = os.getenv("DB_USER", "postgres")
         db_pass = os.getenv("DB_PASS")
         db_name = os.getenv("DB_NAME", "postgres")
 
-        if not instance_connection_name:
-            raise ValueError("CLOUD_SQL_INSTANCE environment variable required")
+        async def getconn():
+            # The async connector binds to the running loop, so it is created
+            # on first use rather than at import time.
+            async with self._connector_lock:
+                if self.connector is None:
+                    from google.cloud.sql.connector import create_async_connector
 
-        self.connector = Connector()
+                    self.connector = await create_async_connector()
 
-        def getconn():
-            conn = self.connector.connect(
+            conn = await self.connector.connect_async(
                 instance_connection_name,
-                "pg8000",
+                "asyncpg",
                 user=db_user,
                 password=db_pass,
                 db=db_name,
+                **self._connect_args(),
             )
             return conn
 
-        self.engine = create_engine(
-            "postgresql+pg8000://",
-            creator=getconn,
-            poolclass=NullPool,
+        return create_async_engine(
+            "postgresql+asyncpg://",
+            async_creator=getconn,
+            **pool_options,
         )
 
     def _init_postgres(self):
         """
-        Initialize direct PostgreSQL connection
+        Initialize direct PostgreSQL connection, plus one engine per read
+        replica URL in DB_REPLICA_URLS
         """
         database_url = os.getenv("DATABASE_URL")
         if not database_url:
             raise ValueError("DATABASE_URL environment variable required")
 
-        self.engine = create_engine(database_url, poolclass=NullPool)
+        self.engine = self._postgres_engine(database_url, self._pool_options())
+        for replica_url in _split_list(os.getenv("DB_REPLICA_URLS")):
+            url = make_url(replica_url)
+            self.replicas.add(
+                f"{url.host}:{url.port or 5432}/{url.database}",
+                self._postgres_engine(url, self._pool_options(replica=True)),
+            )
+
+    def _postgres_engine(self, database_url, pool_options):
+        url = make_url(database_url).set(drivername="postgresql+asyncpg")
+        return create_async_engine(
+            url, connect_args=self._connect_args(), **pool_options
+        )
+
+    async def _acquire(self, engine):
+        """
+        Check out a pooled connection, recording how long the caller waited
+        """
+        start = time.perf_counter()
+        try:
+            conn = await engine.connect()
+        except PoolTimeoutError:
+            self._acquire_timeouts += 1
+            raise
+
+        wait = time.perf_counter() - start
+        record_stage("db_acquire", wait)
+        wait_ms = wait * 1000
+        self._acquire_count += 1
+        self._wait_total_ms += wait_ms
+        self._wait_max_ms = max(self._wait_max_ms, wait_ms)
+        return conn
+
+    @asynccontextmanager
+    async def _connect(self):
+        """
+        Pooled connection to the primary
+        """
+        conn = await self._acquire(self.engine)
+        try:
+            yield conn
+        finally:
+            await conn.close()
+
+    @asynccontextmanager
+    async def _connect_read(self):
+        """
+        Pooled connection for read-only statements: the least busy replica
+        in rotation, or the primary when none is (or the chosen replica has
+        no free connection or cannot be reached)
+        """
+        replica = self.replicas.pick()
+        conn = None
+        if replica is not None:
+            replica.outstanding += 1
+            try:
+                conn = await self._acquire(replica.engine)
+            except PoolTimeoutError:
+                replica.outstanding -= 1
+                replica = None
+            except Exception as e:
+                replica.outstanding -= 1
+                self.replicas.mark_down(replica, str(e) or type(e).__name__)
+                replica = None
+
+        if conn is None:
+            conn = await self._acquire(self.engine)
+        READS.inc(target=replica.name if replica is not None else "primary")
+
+        try:
+            yield conn
+        finally:
+            try:
+                await conn.close()
+            finally:
+                if replica is not None:
+                    replica.outstanding -= 1
+
+    def validate_sql(self, sql_query: str) -> str:
+        """
+        Check a generated statement locally and return the SQL to run
+        (LIMIT injected or clamped). Raises SQLGuardError for anything but
+        a single read-only SELECT.
+        """
+        return self.sql_guard.validate(sql_query)
+
+    async def _check_plan(self, conn, sql_query: str) -> None:
+        """
+        Reject statements whose estimated plan cost or row count is over
+        the configured thresholds
+        """
+        result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql_query}"))
+        estimates = plan_estimates(result.scalar())
+        if estimates is None:
+            return
+
+        if self.max_plan_cost and estimates["cost"] > self.max_plan_cost:
+            raise SQLGuardError(
+                f"Query plan too expensive (estimated cost {estimates['cost']:.0f})"
+            )
+        if self.max_plan_rows and estimates["rows"] > self.max_plan_rows:
+            raise SQLGuardError(
+                f"Query plan too large (estimated {estimates['rows']:.0f} rows)"
+            )
 
     async def execute_query(self, sql_query: str) -> List[Dict[str, Any]]:
         """
         Execute SQL query and return results as list of dictionaries
         """
+        result = await self.fetch_result(sql_query)
+        return result.to_dicts()
+
+    async def fetch_result(self, sql_query: str) -> ResultSet:
+        """
+        Execute SQL query and collect the capped result in compact form
+        """
+        result = None
+        async for chunk in self.stream_query(sql_query):
+            if result is None:
+                result = chunk
+            else:
+                result.extend(chunk)
+        return result
+
+    async def stream_query(
+        self,
+        sql_query: str,
+        batch_size: Optional[int] = None,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> AsyncIterator[ResultSet]:
+        """
+        Execute SQL query on a server-side cursor and yield ResultSet chunks
+        as batches arrive. Fetching stops once the row or byte cap is hit;
+        the last chunk is then marked truncated. Always yields at least one
+        chunk, so callers learn the column names even for empty results.
+        """
+        sql_query = self.validate_sql(sql_query)
+        batch_size = batch_size or self.fetch_batch_size
+        max_rows = self.max_rows if max_rows is None else max_rows
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+
         try:
-            with self.engine.connect() as conn:
-                result = conn.execute(text(sql_query))
+            async with self._connect_read() as conn:
+                if self.max_plan_cost or self.max_plan_rows:
+                    await self._check_plan(conn, sql_query)
+
+                result = await self._open_stream(conn, sql_query, batch_size)
+                try:
+                    columns = list(result.keys())
+                    count, size, emitted = 0, 0, False
+
+                    async for partition in result.partitions():
+                        rows, truncated = [], False
+                        for row in partition:
+                            size += row_size(row)
+                            if count >= max_rows or size > max_bytes:
+                                truncated = True
+                                break
+                            rows.append(tuple(row))
+                            count += 1
 
-                if result.returns_rows:
-                    columns = result.keys()
-                    rows = [dict(zip(columns, row)) for row in result.fetchall()]
-                    return rows
-                else:
-                    return []
+                        emitted = True
+                        yield ResultSet(columns, rows, truncated)
+                        if truncated:
+                            logger.warning(
+                                f"Query result truncated at {count} rows, {size} bytes"
+                            )
+                            break
 
+                    if not emitted:
+                        yield ResultSet(columns)
+                finally:
+                    await result.close()
+
+        except SQLGuardError:
+            raise
         except Exception as e:
             logger.error(f"Query execution error: {str(e)}")
             raise ValueError(f"Failed to execute query: {str(e)}")
 
+    async def _open_stream(self, conn, sql_query: str, batch_size: int):
+        """
+        Start a streaming result, through the statement's parameterized
+        template when that template is hot. A template whose parameters
+        the server cannot bind (e.g. a string compared to a date column)
+        falls back to the literal SQL and is not tried again.
+        """
+        template, params = self._prepared_form(sql_query)
+        if params:
+            statement = text(template).execution_options(yield_per=batch_size)
+            try:
+                result = await conn.stream(statement, params)
+                STATEMENTS.inc(mode="prepared")
+                return result
+            except DBAPIError as e:
+                logger.info(f"Template did not bind, using literal SQL: {str(e)}")
+                self._literal_templates.set(template, True, size=len(template))
+                await conn.rollback()
+
+        STATEMENTS.inc(mode="literal")
+        statement = text(sql_query).execution_options(yield_per=batch_size)
+        return await conn.stream(statement)
+
+    def _prepared_form(self, sql_query: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        (template, params) when the statement should run parameterized,
+        otherwise (sql_query, None)
+        """
+        if not self.prepare_threshold:
+            return sql_query, None
+
+        template, params = parameterize_sql(sql_query)
+        if not params or template in self._literal_templates:
+            return sql_query, None
+
+        hits = self._template_hits.get(template, 0) + 1
+        self._template_hits.set(template, hits, size=len(template))
+        if hits < self.prepare_threshold:
+            return sql_query, None
+        return template, params
+
+    def sql_fingerprint(self, sql_query: str) -> str:
+        """
+        Identifier shared by statements that only differ in literals
+        """
+        return sql_fingerprint(parameterize_sql(sql_query)[0])
+
+    async def execute_cached(self, sql_query: str) -> Tuple[ResultSet, Optional[str]]:
+        """
+        Execute a read query through the result cache.
+        Returns the result and, for cache hits, when it was cached.
+        """
+        sql_query = self.validate_sql(sql_query)
+        if self.result_cache is None:
+            with stage("db_execute"):
+                return await self.fetch_result(sql_query), None
+
+        key = await self.result_cache.key_for(sql_query)
+        if key is None:
+            with stage("db_execute"):
+                return await self.fetch_result(sql_query), None
+
+        entry = await self.result_cache.get(key)
+        if entry is not None:
+            return entry["result"], entry["cached_at"]
+
+        with stage("db_execute"):
+            result = await self.fetch_result(sql_query)
+        await self.result_cache.set(key, result)
+        return result, None
+
+    async def invalidate_results(self, sql_or_tables) -> bool:
+        """
+        Drop cached results for the tables a write statement touches
+        (or for an explicit list of table names). Returns False when the
+        cache backend could not be reached.
+        """
+        if self.result_cache is None:
+            return True
+
+        if isinstance(sql_or_tables, str):
+            sql_or_tables = referenced_tables(sql_or_tables)
+        return await self.result_cache.invalidate(sql_or_tables)
+
+    async def _on_schema_change(
+        self, old_schema: Dict[str, Any], new_schema: Dict[str, Any]
+    ) -> None:
+        """
+        Drop cached results of tables that were added, dropped or altered
+        """
+        changed = [
+            table
+            for table in old_schema.keys() | new_schema.keys()
+            if old_schema.get(table) != new_schema.get(table)
+        ]
+        await self.invalidate_results(changed)
+
     async def get_schema_info(self) -> Dict[str, Any]:
         """
         Get database schema information for AI agent
         """
+        snapshot = await self.get_schema_snapshot()
+        return snapshot.schema
+
+    async def get_schema_snapshot(self) -> SchemaSnapshot:
+        """
+        Get the cached schema together with its serialized prompt fragment
+        """
         try:
-            inspector = inspect(self.engine)
+            return await self.schema_cache.get()
+
+        except Exception as e:
+            logger.error(f"Error getting schema: {str(e)}")
+            return SchemaSnapshot(schema={}, prompt="", fingerprint="")
+
+    async def _load_schema(self) -> Dict[str, Any]:
+        """
+        Introspect tables, columns, primary and foreign keys and comments.
+        Uses the batched get_multi_* reflection API, a handful of catalog
+        queries instead of several per table.
+        """
+
+        def _inspect(sync_conn) -> Dict[str, Any]:
+            inspector = inspect(sync_conn)
+            columns = inspector.get_multi_columns()
+            primary_keys = inspector.get_multi_pk_constraint()
+            foreign_keys = inspector.get_multi_foreign_keys()
+            try:
+                comments = inspector.get_multi_table_comment()
+            except NotImplementedError:
+                comments = {}
+
             schemas = {}
+            for key in sorted(columns, key=lambda k: k[1]):
+                table_columns = []
+                for column in columns[key]:
+                    entry = {
+                        "name": column["name"],
+                        "type": str(column["type"]),
+                        "nullable": column["nullable"],
+                    }
+                    if column.get("comment"):
+                        entry["comment"] = column["comment"]
+                    table_columns.append(entry)
 
-            for table_name in inspector.get_table_names():
-                columns = []
-                for column in inspector.get_columns(table_name):
-                    columns.append(
+                table = {
+                    "columns": table_columns,
+                    "primary_key": primary_keys.get(key) or {},
+                    "foreign_keys": [
                         {
-                            "name": column["name"],
-                            "type": str(column["type"]),
-                            "nullable": column["nullable"],
+                            "constrained_columns": fk["constrained_columns"],
+                            "referred_table": fk["referred_table"],
+                            "referred_columns": fk["referred_columns"],
                         }
-                    )
-
-                schemas[table_name] = {
-                    "columns": columns,
-                    "primary_key": inspector.get_pk_constraint(table_name),
+                        for fk in foreign_keys.get(key) or []
+                    ],
                 }
+                comment = (comments.get(key) or {}).get("text")
+                if comment:
+                    table["comment"] = comment
+                schemas[key[1]] = table
 
             return schemas
 
-        except Exception as e:
-            logger.error(f"Error getting schema: {str(e)}")
-            return {}
+        with stage("schema_load"):
+            async with self._connect_read() as conn:
+                return await conn.run_sync(_inspect)
+
+    async def _schema_fingerprint(self) -> str:
+        """
+        Hash of the column catalog, changes whenever DDL touches a column
+        """
+        async with self._connect_read() as conn:
+            result = await conn.execute(text(SCHEMA_FINGERPRINT_SQL))
+            return result.scalar() or ""
 
     async def health_check(self) -> bool:
         """
         Check database connection health
         """
         try:
-            with self.engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
+            async with self._connect() as conn:
+                await conn.execute(text("SELECT 1"))
             return True
         except Exception as e:
             logger.error(f"Database health check failed: {str(e)}")
             return False
 
-    def close(self):
+    async def warm_up(self, connections: int = 1, schema: bool = True) -> None:
+        """
+        Open up to pool_size connections per engine concurrently and return
+        them to the pool, check the replicas, then load the schema cache,
+        so the first queries skip connector setup, TLS handshakes and
+        introspection. Only primary failures are raised; replicas that
+        cannot be reached just stay out of rotation.
+        """
+        primary, *replicas = await asyncio.gather(
+            self._open_connections(self.engine, min(connections, self.pool_size)),
+            *(
+                self._open_connections(
+                    replica.engine, min(connections, self.replica_pool_size)
+                )
+                for replica in self.replicas.replicas
+            ),
+        )
+        if primary is not None:
+            raise primary
+        await self.replicas.refresh()
+
+        if schema:
+            await self.get_schema_snapshot()
+
+    async def _open_connections(self, engine, count: int) -> Optional[BaseException]:
+        opened = await asyncio.gather(
+            *(engine.connect() for _ in range(max(1, count))), return_exceptions=True
+        )
+        await asyncio.gather(
+            *(conn.close() for conn in opened if not isinstance(conn, BaseException))
+        )
+        for result in opened:
+            if isinstance(result, BaseException):
+                return result
+        return None
+
+    def start(self) -> None:
+        """
+        Start the background replica checks
+        """
+        self.replicas.start()
+
+    @property
+    def read_pool_size(self) -> int:
+        """
+        Pooled connections available to reads across the primary and replicas
+        """
+        return self.pool_size + self.replica_pool_size * len(self.replicas)
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of connection pool usage and acquire wait times
+        """
+        pool = self.engine.pool if self.engine else None
+        if pool is None:
+            return {}
+
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "acquired": self._acquire_count,
+            "acquire_timeouts": self._acquire_timeouts,
+            "wait_avg_ms": round(self._wait_total_ms / self._acquire_count, 2)
+            if self._acquire_count
+            else 0.0,
+            "wait_max_ms": round(self._wait_max_ms, 2),
+            "replicas": self.replicas.stats(),
+        }
+
+    async def close(self):
         """
         Close database connections
         """
+        await self.replicas.close()
+        if self.result_cache is not None:
+            await self.result_cache.close()
         if self.engine:
-            self.engine.dispose()
+            await self.engine.dispose()
         if self.connector:
-            self.connector.close()
+            await self.connector.close_async()
@@ -0,0 +1,85 @@
+import logging
+from typing import Any, Dict, Optional
+
+from result_set import ResultSet
+
+logger = logging.getLogger(__name__)
+
+JSON = "json"
+COLUMNAR = "columnar"
+ARROW = "arrow"
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMNAR_MEDIA_TYPE = "application/vnd.columnar+json"
+
+_FORMATS = (JSON, COLUMNAR, ARROW)
+
+
+def negotiate_format(accept: str, requested: Optional[str] = None) -> str:
+    """
+    Pick the result format from an explicit ?format= value, falling back
+    to the Accept header, then to row-oriented JSON
+    """
+    if requested:
+        requested = requested.lower()
+        if requested not in _FORMATS:
+            raise ValueError(
+                f"Unsupported format '{requested}', expected one of {list(_FORMATS)}"
+            )
+        return requested
+
+    accept = accept.lower()
+    if ARROW_MEDIA_TYPE in accept:
+        return ARROW
+    if COLUMNAR_MEDIA_TYPE in accept:
+        return COLUMNAR
+    return JSON
+
+
+def results_payload(result: ResultSet, fmt: str) -> Any:
+    """
+    JSON-serializable results: a list of row dicts, or the column-major
+    {"columns": [...], "data": [...]} shape for the columnar format
+    """
+    if fmt == COLUMNAR:
+        return result.to_columnar()
+    return result.to_dicts()
+
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def to_arrow_ipc(result: ResultSet, metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    Encode a result as an Arrow IPC stream. Response fields travel in the
+    schema metadata. Columns whose values Arrow cannot infer a single type
+    for are sent as strings.
+    """
+    # Deferred so that JSON-only deployments never pay pyarrow's import cost
+    import pyarrow as pa
+
+    columns = list(zip(*result.rows)) if result.rows else [()] * len(result.columns)
+
+    arrays = []
+    for name, values in zip(result.columns, columns):
+        try:
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            logger.warning(f"Column {name} has mixed types, encoding as string")
+            arrays.append(
+                pa.array([None if v is None else str(v) for v in values], pa.string())
+            )
+
+    schema_metadata = {k: str(v) for k, v in (metadata or {}).items() if v is not None}
+    batch = pa.RecordBatch.from_arrays(arrays, names=result.columns)
+    batch = batch.replace_schema_metadata(schema_metadata)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
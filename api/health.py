@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """
+    Runs dependency checks in a background task and caches the results,
+    so probe endpoints answer from memory without doing any I/O.
+
+    Each check is an async callable returning True when healthy; it is
+    bounded by timeout_seconds so a hanging dependency reads as failed
+    instead of stalling the refresher. The service is ready once every
+    critical check passed in a recent round. Results older than three
+    intervals count as failed, in case the refresher itself stops.
+    """
+
+    def __init__(
+        self,
+        checks: Dict[str, Callable[[], Awaitable[bool]]],
+        critical: Iterable[str] = (),
+        interval_seconds: float = 10,
+        timeout_seconds: float = 3,
+    ):
+        self.checks = checks
+        self.critical = set(critical)
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._refreshed_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self) -> None:
+        """
+        Run every check once, concurrently
+        """
+        names = list(self.checks)
+        results = await asyncio.gather(*(self._check(name) for name in names))
+        self._results = dict(zip(names, results))
+        self._refreshed_at = time.monotonic()
+
+    def is_fresh(self) -> bool:
+        return (
+            self._refreshed_at is not None
+            and time.monotonic() - self._refreshed_at < 3 * self.interval_seconds
+        )
+
+    def is_ready(self) -> bool:
+        if not self.is_fresh():
+            return False
+        return all(self._results.get(name, {}).get("ok") for name in self.critical)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self._results)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Health refresh failed: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def _check(self, name: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        error = None
+        try:
+            ok = bool(await asyncio.wait_for(self.checks[name](), self.timeout_seconds))
+        except asyncio.TimeoutError:
+            ok, error = False, f"timed out after {self.timeout_seconds}s"
+        except Exception as e:
+            ok, error = False, str(e)
+
+        if not ok:
+            logger.warning(f"Health check {name} failed: {error or 'unhealthy'}")
+
+        result = {
+            "ok": ok,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+            "checked_at": datetime.utcnow().isoformat(),
+        }
+        if error:
+            result["error"] = error
+        return result
@@ -0,0 +1,35 @@
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Optional
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Time-ordered UUID (RFC 9562 version 7): 48-bit Unix millisecond
+    timestamp followed by random bits
+    """
+    ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+
+    value = (ms & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76
+    value |= ((rand >> 68) & 0xFFF) << 64
+    value |= 0b10 << 62
+    value |= rand & ((1 << 62) - 1)
+    return uuid.UUID(int=value)
+
+
+def uuid7_datetime(value: str) -> Optional[datetime]:
+    """
+    UTC creation time embedded in a UUIDv7 string, or None for other IDs
+    """
+    try:
+        parsed = uuid.UUID(value)
+    except ValueError:
+        return None
+
+    if parsed.version != 7:
+        return None
+    return datetime.utcfromtimestamp((parsed.int >> 80) / 1000)
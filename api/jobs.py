@@ -0,0 +1,247 @@
+import asyncio
+import itertools
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from cache import LRUCache
+from ids import uuid7
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+
+FINAL_STATUSES = (SUCCEEDED, FAILED, CANCELLED, TIMED_OUT)
+
+# Lower runs first; jobs of equal priority run in submission order
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+JOBS = REGISTRY.counter("jobs_total", "Background jobs by final status", ["status"])
+JOB_DURATION = REGISTRY.histogram(
+    "job_duration_seconds",
+    "Background job run time, from start to final status",
+    ["status"],
+    buckets=(1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+JOB_QUEUE_WAIT = REGISTRY.histogram(
+    "job_queue_wait_seconds",
+    "Time background jobs spent queued before a worker picked them up",
+    ["priority"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+
+
+def _seconds_between(start: str, end: str) -> float:
+    return (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()
+
+
+class JobQueueFull(Exception):
+    """
+    The job queue is at capacity
+    """
+
+
+class JobManager:
+    """
+    Bounded in-process worker pool for long-running work.
+
+    Submitted jobs wait in a priority queue until one of the worker tasks
+    picks them up, so at most `workers` run at once. Every status change
+    is persisted through the store (save_job/get_job), which lets other
+    instances answer status polls; cancellation only reaches jobs owned by
+    this instance. Each job runs under its own timeout.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        store=None,
+        workers: int = 2,
+        max_queue: int = 100,
+        default_timeout: float = 600,
+        max_timeout: float = 3600,
+    ):
+        self.run = run
+        self.store = store
+        self.workers = workers
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self.max_timeout = max_timeout
+
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._cancelled = set()
+        self._done: Dict[str, asyncio.Event] = {}
+        self._finished = LRUCache(max_entries=1000)
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._workers = [t for t in self._workers if not t.done()]
+        while len(self._workers) < self.workers:
+            self._workers.append(asyncio.create_task(self._work()))
+
+    async def stop(self) -> None:
+        """
+        Stop the workers. Jobs still queued or running are recorded as
+        cancelled, since nothing will pick them up again.
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        for job in list(self._jobs.values()):
+            await self._finish(job, CANCELLED, error="Instance shut down")
+
+    async def submit(
+        self,
+        payload: Dict[str, Any],
+        priority: str = "normal",
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Queue payload for run() and return the job record. Raises
+        JobQueueFull when max_queue jobs are already waiting.
+        """
+        if self.stats()["queued"] >= self.max_queue:
+            raise JobQueueFull(f"Job queue is full ({self.max_queue} queued)")
+
+        job_id = str(uuid7())
+        job = {
+            "job_id": job_id,
+            "status": QUEUED,
+            "priority": priority,
+            "timeout_seconds": min(timeout or self.default_timeout, self.max_timeout),
+            "submitted_at": datetime.utcnow().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "request": payload,
+        }
+        self._jobs[job_id] = job
+        self._done[job_id] = asyncio.Event()
+        self._queue.put_nowait(
+            (PRIORITIES[priority], next(self._sequence), job_id, payload)
+        )
+        await self._save(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Job record from this instance, or from the store
+        """
+        job = self._jobs.get(job_id) or self._finished.get(job_id)
+        if job is not None:
+            return job
+        if self.store is None:
+            return None
+        return await self.store.get_job(job_id)
+
+    def owns(self, job_id: str) -> bool:
+        return job_id in self._jobs
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a queued or running job of this instance and return its
+        record, or None if this instance does not have it in progress
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        if job["status"] == QUEUED:
+            await self._finish(job, CANCELLED)
+            return job
+
+        task = self._tasks.get(job_id)
+        if task is not None:
+            self._cancelled.add(job_id)
+            task.cancel()
+            # The worker records the outcome
+            await self._done[job_id].wait()
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        running = sum(1 for job in self._jobs.values() if job["status"] == RUNNING)
+        return {"queued": len(self._jobs) - running, "running": running}
+
+    async def _work(self) -> None:
+        while True:
+            _, _, job_id, payload = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != QUEUED:
+                # Cancelled while queued
+                continue
+            await self._execute(job, payload)
+
+    async def _execute(self, job: Dict[str, Any], payload: Dict[str, Any]) -> None:
+        job_id = job["job_id"]
+        job["status"] = RUNNING
+        job["started_at"] = datetime.utcnow().isoformat()
+        JOB_QUEUE_WAIT.observe(
+            _seconds_between(job["submitted_at"], job["started_at"]),
+            priority=job["priority"],
+        )
+        task = asyncio.ensure_future(self.run(payload))
+        self._tasks[job_id] = task
+        try:
+            await self._save(job)
+            result = await asyncio.wait_for(task, job["timeout_seconds"])
+        except asyncio.TimeoutError:
+            await self._finish(
+                job, TIMED_OUT, error=f"Timed out after {job['timeout_seconds']}s"
+            )
+        except asyncio.CancelledError:
+            if job_id not in self._cancelled:
+                # The worker itself is being stopped; stop() records it
+                raise
+            await self._finish(job, CANCELLED)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            detail = str(e) if isinstance(e, ValueError) else "Internal server error"
+            await self._finish(job, FAILED, error=detail)
+        else:
+            await self._finish(job, SUCCEEDED, result=result)
+        finally:
+            self._tasks.pop(job_id, None)
+            self._cancelled.discard(job_id)
+
+    async def _finish(
+        self,
+        job: Dict[str, Any],
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        job["status"] = status
+        job["finished_at"] = datetime.utcnow().isoformat()
+        if result is not None:
+            job["result"] = result
+        if error is not None:
+            job["error"] = error
+
+        self._jobs.pop(job["job_id"], None)
+        self._finished.set(job["job_id"], job)
+
+        JOBS.inc(status=status)
+        if job["started_at"]:
+            JOB_DURATION.observe(
+                _seconds_between(job["started_at"], job["finished_at"]), status=status
+            )
+        await self._save(job)
+        self._done.pop(job["job_id"]).set()
+
+    async def _save(self, job: Dict[str, Any]) -> None:
+        if self.store is None:
+            return
+        try:
+            await self.store.save_job(job)
+        except Exception as e:
+            logger.error(f"Failed to persist job {job['job_id']}: {str(e)}")
@@ -0,0 +1,424 @@
+import asyncio
+import contextvars
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+SEGMENT_WRITE_LATENCY = REGISTRY.histogram(
+    "log_segment_write_seconds",
+    "Time to write one query log segment to its sink",
+)
+
+DROP_NEWEST = "drop_newest"
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+
+
+class GCSSink:
+    """
+    Segment storage in a GCS bucket. The client is synchronous, so calls
+    run in the default thread pool instead of on the event loop.
+    """
+
+    def __init__(self, bucket):
+        # A bucket, or a callable returning one so the client can be
+        # created lazily (always from a worker thread)
+        self._bucket = bucket
+
+    @property
+    def bucket(self):
+        if callable(self._bucket):
+            self._bucket = self._bucket()
+        return self._bucket
+
+    async def write(self, name: str, data: bytes, content_type: str) -> None:
+        def _upload():
+            self.bucket.blob(name).upload_from_string(data, content_type=content_type)
+
+        await asyncio.to_thread(_upload)
+
+    async def read(self, name: str) -> Optional[bytes]:
+        def _download():
+            blob = self.bucket.blob(name)
+            return blob.download_as_bytes() if blob.exists() else None
+
+        return await asyncio.to_thread(_download)
+
+    async def read_range(self, name: str, offset: int, length: int) -> bytes:
+        def _download():
+            return self.bucket.blob(name).download_as_bytes(
+                start=offset, end=offset + length - 1
+            )
+
+        return await asyncio.to_thread(_download)
+
+    async def list(self, prefix: str) -> List[str]:
+        def _list():
+            return [blob.name for blob in self.bucket.list_blobs(prefix=prefix)]
+
+        return await asyncio.to_thread(_list)
+
+
+class LocalSink:
+    """
+    Segment storage on the local filesystem, for development and tests
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    async def write(self, name: str, data: bytes, content_type: str) -> None:
+        def _write():
+            path = os.path.join(self.directory, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+
+        await asyncio.to_thread(_write)
+
+    async def read(self, name: str) -> Optional[bytes]:
+        def _read():
+            path = os.path.join(self.directory, name)
+            if not os.path.exists(path):
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+
+        return await asyncio.to_thread(_read)
+
+    async def read_range(self, name: str, offset: int, length: int) -> bytes:
+        def _read():
+            with open(os.path.join(self.directory, name), "rb") as f:
+                f.seek(offset)
+                return f.read(length)
+
+        return await asyncio.to_thread(_read)
+
+    async def list(self, prefix: str) -> List[str]:
+        def _list():
+            names = []
+            for root, _, files in os.walk(self.directory):
+                for file in files:
+                    name = os.path.relpath(os.path.join(root, file), self.directory)
+                    name = name.replace(os.sep, "/")
+                    if name.startswith(prefix):
+                        names.append(name)
+            return sorted(names)
+
+        return await asyncio.to_thread(_list)
+
+
+class SQLiteLogIndex:
+    """
+    Local index from log key to (segment, offset, length)
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS log_index ("
+            "key TEXT PRIMARY KEY, segment TEXT, offset INTEGER, length INTEGER)"
+        )
+        self._conn.commit()
+
+    async def put_many(self, segment: str, entries: List[Tuple[str, int, int]]) -> None:
+        def _put():
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO log_index VALUES (?, ?, ?, ?)",
+                    [(key, segment, offset, length) for key, offset, length in entries],
+                )
+                self._conn.commit()
+
+        await asyncio.to_thread(_put)
+
+    async def get(self, key: str) -> Optional[Tuple[str, int, int]]:
+        def _get():
+            with self._lock:
+                return self._conn.execute(
+                    "SELECT segment, offset, length FROM log_index WHERE key = ?",
+                    (key,),
+                ).fetchone()
+
+        row = await asyncio.to_thread(_get)
+        return tuple(row) if row else None
+
+
+class FirestoreLogIndex:
+    """
+    Firestore-backed index from log key to (segment, offset, length).
+    Documents carry an expire_at field for a Firestore TTL policy.
+    """
+
+    # Firestore limits a batched write to 500 operations
+    MAX_BATCH = 500
+
+    def __init__(
+        self,
+        collection: str = "query_log_index",
+        database: Optional[str] = None,
+        ttl_days: int = 90,
+    ):
+        self.collection = collection
+        self.database = database
+        self.ttl_days = ttl_days
+        self._client = None
+
+    @property
+    def client(self):
+        # Created on first use so the gRPC channel binds to the running loop
+        if self._client is None:
+            from google.cloud import firestore
+
+            self._client = firestore.AsyncClient(database=self.database)
+        return self._client
+
+    async def put_many(self, segment: str, entries: List[Tuple[str, int, int]]) -> None:
+        expire_at = datetime.utcnow() + timedelta(days=self.ttl_days)
+        collection = self.client.collection(self.collection)
+
+        for start in range(0, len(entries), self.MAX_BATCH):
+            batch = self.client.batch()
+            for key, offset, length in entries[start : start + self.MAX_BATCH]:
+                batch.set(
+                    collection.document(key),
+                    {
+                        "segment": segment,
+                        "offset": offset,
+                        "length": length,
+                        "expire_at": expire_at,
+                    },
+                )
+            await batch.commit()
+
+    async def get(self, key: str) -> Optional[Tuple[str, int, int]]:
+        snapshot = await self.client.collection(self.collection).document(key).get()
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict()
+        return data["segment"], data["offset"], data["length"]
+
+
+def decode_segment(name: str, data: bytes) -> List[Dict[str, Any]]:
+    """
+    Parse a newline-delimited JSON segment (or a byte range of one),
+    gunzipping .gz segments
+    """
+    if name.endswith(".gz"):
+        data = gzip.decompress(data)
+    return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+
+class BatchLogWriter:
+    """
+    Background writer that batches log entries into NDJSON segment files.
+
+    Entries go into a bounded in-memory queue. A flusher task writes a
+    segment when max_batch_entries or max_batch_bytes is reached, or
+    flush_interval seconds after the first entry of a batch arrived. When
+    the queue is full the drop policy decides: drop_newest rejects the new
+    entry, drop_oldest evicts the oldest queued one, block waits for room.
+
+    With an index, every written entry's index_field value is mapped to
+    its byte range in the segment, so it can be fetched with one ranged
+    read. Compressed segments gzip each line as its own member to keep
+    those ranges independently decodable.
+    """
+
+    def __init__(
+        self,
+        sink,
+        prefix: str = "query_logs",
+        max_queue: int = 10000,
+        max_batch_entries: int = 500,
+        max_batch_bytes: int = 1024 * 1024,
+        flush_interval: float = 5.0,
+        compress: bool = False,
+        drop_policy: str = DROP_NEWEST,
+        max_retries: int = 3,
+        index=None,
+        index_field: str = "query_id",
+    ):
+        self.sink = sink
+        self.index = index
+        self.index_field = index_field
+        self.prefix = prefix
+        self.max_batch_entries = max_batch_entries
+        self.max_batch_bytes = max_batch_bytes
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.drop_policy = drop_policy
+        self.max_retries = max_retries
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._instance = uuid.uuid4().hex[:8]
+        self._sequence = 0
+
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.segments = 0
+
+    async def put(self, entry: Dict[str, Any]) -> bool:
+        """
+        Queue an entry for writing. Returns False if it was dropped.
+        Only waits when the drop policy is block and the queue is full.
+        """
+        if self._closed:
+            self.dropped += 1
+            return False
+
+        self._ensure_started()
+
+        if self.drop_policy == BLOCK:
+            await self._queue.put(entry)
+            self.submitted += 1
+            return True
+
+        if self._queue.full():
+            if self.drop_policy != DROP_OLDEST:
+                self.dropped += 1
+                return False
+            self._queue.get_nowait()
+            self.dropped += 1
+
+        self._queue.put_nowait(entry)
+        self.submitted += 1
+        return True
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """
+        Stop accepting entries and flush everything still queued
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        if self._task is None:
+            return
+
+        await self._queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Log writer flush timed out, {self._queue.qsize()} lost")
+            self._task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "segments": self.segments,
+        }
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            # Started from whichever request logs first; a fresh context
+            # keeps that request's ID and stage timings out of the writer
+            self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                return
+
+            line = self._encode(entry)
+            batch = [(entry, line)]
+            size = len(line)
+            deadline = loop.time() + self.flush_interval
+            stop = False
+
+            while len(batch) < self.max_batch_entries and size < self.max_batch_bytes:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+
+                line = self._encode(entry)
+                batch.append((entry, line))
+                size += len(line)
+
+            await self._write(batch)
+            if stop:
+                return
+
+    def _encode(self, entry: Dict[str, Any]) -> bytes:
+        return json.dumps(entry, default=str, separators=(",", ":")).encode() + b"\n"
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], bytes]]) -> None:
+        now = datetime.utcnow()
+        self._sequence += 1
+        name = (
+            f"{self.prefix}/{now.strftime('%Y/%m/%d')}/"
+            f"{now.strftime('%H%M%S_%f')}_{self._instance}_{self._sequence:06d}.ndjson"
+        )
+
+        chunks = [line for _, line in batch]
+        content_type = "application/x-ndjson"
+        if self.compress:
+            chunks = [gzip.compress(chunk) for chunk in chunks]
+            name += ".gz"
+            content_type = "application/gzip"
+
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                with SEGMENT_WRITE_LATENCY.time():
+                    await self.sink.write(name, b"".join(chunks), content_type)
+                self.written += len(batch)
+                self.segments += 1
+                logger.info(f"Query log segment written: {name} ({len(batch)} entries)")
+                break
+            except Exception as e:
+                logger.error(
+                    f"Failed to write log segment {name} (attempt {attempt}): {str(e)}"
+                )
+                await asyncio.sleep(0.5 * attempt)
+        else:
+            self.failed += len(batch)
+            return
+
+        if self.index is not None:
+            await self._index_segment(name, [entry for entry, _ in batch], chunks)
+
+    async def _index_segment(
+        self, name: str, batch: List[Dict[str, Any]], chunks: List[bytes]
+    ) -> None:
+        entries, offset = [], 0
+        for entry, chunk in zip(batch, chunks):
+            key = entry.get(self.index_field)
+            if key:
+                entries.append((str(key), offset, len(chunk)))
+            offset += len(chunk)
+
+        try:
+            await self.index.put_many(name, entries)
+        except Exception as e:
+            logger.error(f"Failed to index log segment {name}: {str(e)}")
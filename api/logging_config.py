@@ -1,8 +1,33 @@
+import atexit
 import logging
 import json
+import queue
+import random
 import sys
-from datetime import datetime
-from typing import Any
+import time
+import zlib
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_json_encoder = json.JSONEncoder(separators=(",", ":"), default=str)
+
+# Request ID of the request being handled, attached to every record
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+def _dumps(entry: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(entry, default=str).decode()
+    return _json_encoder.encode(entry)
 
 
 class StructuredFormatter(logging.Formatter):
@@ -12,8 +37,11 @@ class StructuredFormatter(logging.Formatter):
     """
 
     def format(self, record: logging.LogRecord) -> str:
+        # record.created is set at the logging call, so the timestamp stays
+        # accurate when formatting is deferred to the writer thread
         log_entry = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
             "severity": record.levelname,
             "message": record.getMessage(),
             "logger": record.name,
@@ -39,25 +67,140 @@ class StructuredFormatter(logging.Formatter):
 
         if record.exc_info:
             log_entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            log_entry["exception"] = record.exc_text
+
+        return _dumps(log_entry)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to a bounded queue drained by a QueueListener thread, so
+    logging calls on the event loop never wait on stdout. Records that do
+    not fit are counted and dropped. Only the message is rendered on the
+    caller's side; JSON serialization happens on the writer thread.
+
+    INFO and DEBUG records can be sampled: with a rate below 1, a request
+    keeps all or none of its lines (sampled by request ID). Warnings and
+    errors are always kept.
+    """
+
+    def __init__(self, log_queue: queue.Queue, sample_rate: float = 1.0):
+        super().__init__(log_queue)
+        self.sample_rate = sample_rate
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not super().filter(record):
+            return False
+        if self.sample_rate >= 1 or record.levelno > logging.INFO:
+            return True
+
+        request_id = getattr(record, "request_id", None) or _request_id.get()
+        if request_id:
+            keep = zlib.crc32(request_id.encode()) % 10000 < self.sample_rate * 10000
+        else:
+            keep = random.random() < self.sample_rate
+        if not keep:
+            self.sampled_out += 1
+        return keep
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Mutated in place rather than copied; this is the only root handler
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        if not hasattr(record, "request_id"):
+            request_id = _request_id.get()
+            if request_id:
+                record.request_id = request_id
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogListener(QueueListener):
+    """
+    QueueListener whose stop() waits for room in a full queue, so shutdown
+    flushes instead of failing
+    """
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
 
-        return json.dumps(log_entry)
 
+def set_request_id(request_id: Optional[str]) -> None:
+    """
+    Tag every record logged from the current request context
+    """
+    _request_id.set(request_id)
 
-def setup_logging(log_level: str = "INFO") -> None:
+
+def setup_logging(
+    log_level: str = "INFO",
+    use_queue: bool = True,
+    queue_size: int = 10000,
+    sample_rate: float = 1.0,
+) -> None:
     """Configure structured logging for the application."""
+    global _listener, _queue_handler
+
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, log_level.upper(), logging.INFO))
 
+    shutdown_logging()
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
 
     handler = logging.StreamHandler(sys.stdout)
     handler.setFormatter(StructuredFormatter())
-    root_logger.addHandler(handler)
+
+    if use_queue:
+        log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        _queue_handler = NonBlockingQueueHandler(log_queue, sample_rate=sample_rate)
+        _listener = LogListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        root_logger.addHandler(_queue_handler)
+    else:
+        root_logger.addHandler(handler)
 
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
 
 
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener, _queue_handler
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+atexit.register(shutdown_logging)
+
+
+def logging_stats() -> dict[str, int]:
+    """Queue depth and records dropped or sampled out since setup."""
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0, "sampled_out": 0}
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "sampled_out": _queue_handler.sampled_out,
+    }
+
+
 def get_logger(name: str) -> logging.Logger:
     """Get a logger instance with the given name."""
     return logging.getLogger(name)
@@ -74,6 +217,9 @@ def log_with_context(
     extra_data: dict[str, Any] = None,
 ) -> None:
     """Log a message with additional context fields."""
+    if not logger.isEnabledFor(level):
+        return
+
     extra = {}
     if request_id:
         extra["request_id"] = request_id
@@ -86,4 +232,5 @@ def log_with_context(
     if extra_data:
         extra["extra_data"] = extra_data
 
-    logger.log(level, message, extra=extra)
+    # stacklevel points module/function/line at the caller, not this helper
+    logger.log(level, message, extra=extra, stacklevel=2)
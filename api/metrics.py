@@ -0,0 +1,287 @@
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+# Latency buckets in seconds, from cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        return dict(self._values)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with optional labels. observe() is a bisect and
+    three additions, cheap enough for per-request hot paths.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def series(self) -> Dict[Tuple[str, ...], tuple]:
+        """
+        label key -> (cumulative bucket counts, sum, count)
+        """
+        result = {}
+        for key, (counts, total, count) in self._series.items():
+            cumulative, running = [], 0
+            for c in counts:
+                running += c
+                cumulative.append(running)
+            result[key] = (cumulative, total, count)
+        return result
+
+
+class CallbackMetric:
+    """
+    Gauge or counter whose values are read from a callback at scrape time,
+    for state that already lives elsewhere (pool, cache and queue stats).
+    The callback returns a number, or a dict of label tuples to numbers.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        fn: Callable[[], Union[float, Dict[Tuple[str, ...], float]]],
+        labelnames: Sequence[str] = (),
+        type: str = "gauge",
+    ):
+        self.name = name
+        self.description = description
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.type = type
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        value = self.fn()
+        if isinstance(value, dict):
+            return value
+        return {(): value}
+
+
+class MetricsRegistry:
+    """
+    Process-wide collection of named metrics
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(
+        self, name: str, description: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self._get_or_create(Counter, name, description, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(
+            Histogram, name, description, labelnames, buckets=buckets
+        )
+
+    def callback(
+        self,
+        name: str,
+        description: str,
+        fn: Callable,
+        labelnames: Sequence[str] = (),
+        type: str = "gauge",
+    ) -> CallbackMetric:
+        metric = CallbackMetric(name, description, fn, labelnames, type)
+        self._metrics[name] = metric
+        return metric
+
+    def metrics(self):
+        return list(self._metrics.values())
+
+    def _get_or_create(self, cls, name, description, labelnames, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, description, labelnames, **kwargs)
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_LATENCY = REGISTRY.histogram(
+    "stage_latency_seconds",
+    "Time spent in each stage of request processing",
+    ["stage"],
+)
+
+# Per-request stage durations in milliseconds, for the Server-Timing header
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("timings", default=None)
+
+
+def start_timings() -> Dict[str, float]:
+    """
+    Begin collecting stage timings for the current request. Tasks spawned
+    afterwards share the same dict.
+    """
+    timings: Dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block into stage_latency_seconds and the current request's
+    timings. Repeated stages within a request add up.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_LATENCY.observe(seconds, stage=name)
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds * 1000
+
+
+def add_timings(timings: Dict[str, float]) -> None:
+    """
+    Add stage timings collected in another context (e.g. a shared flight)
+    to the current request's, without observing them again
+    """
+    current = _timings.get()
+    if current is not None:
+        for name, ms in timings.items():
+            current[name] = current.get(name, 0.0) + ms
+
+
+def server_timing(timings: Dict[str, float], total_ms: float) -> str:
+    """
+    Server-Timing header value, e.g. sql_generation;dur=812.4, total;dur=950.1
+    """
+    entries = [f"{name};dur={ms:.1f}" for name, ms in timings.items()]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+# Starlette appends the charset to text/* media types
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render(registry: MetricsRegistry = REGISTRY, openmetrics: bool = False) -> str:
+    """
+    Text exposition of every metric: Prometheus 0.0.4 format, or
+    OpenMetrics 1.0 when openmetrics is set
+    """
+    lines: List[str] = []
+    for metric in registry.metrics():
+        family = metric.name
+        if openmetrics and metric.type == "counter" and family.endswith("_total"):
+            family = family[: -len("_total")]
+
+        lines.append(f"# HELP {family} {metric.description}")
+        lines.append(f"# TYPE {family} {metric.type}")
+
+        if metric.type == "histogram":
+            for key, (counts, total, count) in metric.series().items():
+                for bound, cumulative in zip((*metric.buckets, math.inf), counts):
+                    le = f'le="{_number(bound)}"'
+                    labels = _labels(metric.labelnames, key, le)
+                    lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                labels = _labels(metric.labelnames, key)
+                lines.append(f"{metric.name}_sum{labels} {_number(total)}")
+                lines.append(f"{metric.name}_count{labels} {count}")
+            continue
+
+        try:
+            values = metric.values()
+        except Exception:
+            # A failing collector must not break the whole scrape
+            continue
+
+        sample = metric.name
+        if openmetrics and metric.type == "counter":
+            sample = family + "_total"
+        for key, value in values.items():
+            labels = _labels(metric.labelnames, key)
+            lines.append(f"{sample}{labels} {_number(value)}")
+
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
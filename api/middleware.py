@@ -1,66 +1,120 @@
+import logging
 import time
 import uuid
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-import logging
 
-from logging_config import log_with_context
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from logging_config import log_with_context, set_request_id
+from metrics import REGISTRY, server_timing, start_timings
 
 logger = logging.getLogger(__name__)
 
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by method, route template and status",
+    ["method", "route", "status"],
+)
+
+
+def _route(scope: Scope) -> str:
+    # Route templates keep label cardinality bounded (/queries/{query_id})
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
 
-class RequestTracingMiddleware(BaseHTTPMiddleware):
+def _header(scope: Scope, name: bytes) -> str:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+class RequestTracingMiddleware:
     """
     Middleware for request tracing and metrics collection.
     Adds request ID, logs request/response details, and tracks latency.
+
+    Plain ASGI rather than BaseHTTPMiddleware: the response is passed
+    through untouched except for the headers added to its start message,
+    so streaming bodies are not buffered or re-wrapped. Response headers
+    carry the time to first byte; the completion log line and histogram
+    use the time until the body finished.
     """
 
-    async def dispatch(self, request: Request, call_next) -> Response:
-        request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
-        request.state.request_id = request_id
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-        start_time = time.perf_counter()
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        log_with_context(
-            logger,
-            logging.INFO,
-            f"Request started: {request.method} {request.url.path}",
-            request_id=request_id,
-            extra_data={
-                "method": request.method,
-                "path": request.url.path,
-                "query_params": str(request.query_params),
-            },
-        )
+        request_id = _header(scope, b"x-request-id") or str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        set_request_id(request_id)
 
-        try:
-            response = await call_next(request)
-            duration_ms = (time.perf_counter() - start_time) * 1000
+        method, path = scope["method"], scope["path"]
+        start_time = time.perf_counter()
+        timings = start_timings()
+        status_code = 500
 
+        if logger.isEnabledFor(logging.INFO):
             log_with_context(
                 logger,
                 logging.INFO,
-                f"Request completed: {request.method} {request.url.path}",
+                f"Request started: {method} {path}",
                 request_id=request_id,
-                duration_ms=round(duration_ms, 2),
-                status_code=response.status_code,
+                extra_data={
+                    "method": method,
+                    "path": path,
+                    "query_params": scope.get("query_string", b"").decode("latin-1"),
+                },
             )
 
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Response-Time-Ms"] = str(round(duration_ms, 2))
+        async def send_with_headers(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                duration_ms = (time.perf_counter() - start_time) * 1000
+
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                headers["X-Response-Time-Ms"] = str(round(duration_ms, 2))
+                # Streaming responses only carry the stages finished by now
+                headers["Server-Timing"] = server_timing(timings, duration_ms)
+            await send(message)
 
-            return response
+        try:
+            await self.app(scope, receive, send_with_headers)
 
         except Exception as e:
-            duration_ms = (time.perf_counter() - start_time) * 1000
+            duration = time.perf_counter() - start_time
+            REQUEST_LATENCY.observe(
+                duration, method=method, route=_route(scope), status=500
+            )
 
             log_with_context(
                 logger,
                 logging.ERROR,
-                f"Request failed: {request.method} {request.url.path} - {str(e)}",
+                f"Request failed: {method} {path} - {str(e)}",
                 request_id=request_id,
-                duration_ms=round(duration_ms, 2),
+                duration_ms=round(duration * 1000, 2),
                 status_code=500,
             )
             raise
+
+        duration = time.perf_counter() - start_time
+        REQUEST_LATENCY.observe(
+            duration, method=method, route=_route(scope), status=status_code
+        )
+
+        if logger.isEnabledFor(logging.INFO):
+            log_with_context(
+                logger,
+                logging.INFO,
+                f"Request completed: {method} {path}",
+                request_id=request_id,
+                duration_ms=round(duration * 1000, 2),
+                status_code=status_code,
+            )
@@ -0,0 +1,352 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Lower is served first when calls queue for a slot: SQL generation is on
+# the critical path of every query, summaries can wait
+PRIORITIES = {"sql": 0, "summary": 1}
+
+# HTTP statuses worth retrying; 429 and 503 also mean "slow down"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+OVERLOAD_STATUS = {429, 503}
+
+MODEL_CALLS = REGISTRY.counter(
+    "model_calls_total",
+    "Gemini calls by call type and outcome (ok, error or unavailable)",
+    ["call", "outcome"],
+)
+MODEL_RETRIES = REGISTRY.counter(
+    "model_retries_total", "Gemini call attempts retried", ["call"]
+)
+MODEL_HEDGES = REGISTRY.counter(
+    "model_hedges_total", "Hedged (duplicate) Gemini attempts sent", ["call"]
+)
+MODEL_QUEUE_WAIT = REGISTRY.histogram(
+    "model_queue_wait_seconds",
+    "Time Gemini calls waited for a concurrency slot",
+    ["call"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+
+class ModelUnavailableError(Exception):
+    """
+    The model could not be reached within the retry and queueing limits
+    (quota exhausted, overloaded or failing)
+    """
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """
+    HTTP status carried by an SDK error, if any
+    """
+    for attr in ("code", "status_code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    # Timeouts and transport failures (httpx.TransportError and friends)
+    return isinstance(error, (TimeoutError, ConnectionError)) or any(
+        cls.__name__ == "TransportError" for cls in type(error).__mro__
+    )
+
+
+def is_overload(error: BaseException) -> bool:
+    return status_code(error) in OVERLOAD_STATUS or isinstance(error, TimeoutError)
+
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second on average, bursts of up to `burst`
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def take(self) -> None:
+        while True:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RetryBudget:
+    """
+    Caps retries and hedges at `ratio` extra attempts per call over the
+    last `window` seconds, plus `min_per_second` so that low traffic can
+    still retry. Keeps an outage from multiplying the load on the model.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, min_per_second: float = 1, window: float = 10
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        self._calls: deque = deque()
+        self._retries: deque = deque()
+
+    def deposit(self) -> None:
+        self._calls.append(time.monotonic())
+
+    def withdraw(self) -> bool:
+        now = time.monotonic()
+        for events in (self._calls, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+        allowed = self.ratio * len(self._calls) + self.min_per_second * self.window
+        if len(self._retries) >= allowed:
+            return False
+        self._retries.append(now)
+        return True
+
+
+class ModelScheduler:
+    """
+    Admission, rate limiting and retries for model calls.
+
+    - Concurrency is capped by an AIMD limit: each successful call raises
+      it by 1/limit (about +1 per round of calls), an overload signal (429,
+      503 or a timeout) halves it, once per round of calls.
+    - Calls over the limit queue by priority (see PRIORITIES) and give up
+      with ModelUnavailableError after queue_timeout.
+    - An optional token bucket caps the attempt rate.
+    - Retryable failures are retried with full-jitter exponential backoff
+      while the retry budget allows.
+    - With hedge_delay set, a second attempt is sent when the first has
+      not answered by then; the first answer wins.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        rate: float = 0,
+        burst: float = 10,
+        max_attempts: int = 3,
+        retry_budget: float = 0.2,
+        backoff_base: float = 0.2,
+        backoff_max: float = 5.0,
+        call_timeout: float = 30.0,
+        queue_timeout: float = 10.0,
+        hedge_delay: float = 0,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.limit = float(min(max(initial_limit, min_limit), self.max_limit))
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.call_timeout = call_timeout
+        self.queue_timeout = queue_timeout
+        self.hedge_delay = hedge_delay
+
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.budget = RetryBudget(ratio=retry_budget)
+
+        self._in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._last_decrease = 0.0
+
+    async def call(
+        self, call: str, fn: Callable[[], Awaitable[T]], hedge: bool = True
+    ) -> T:
+        """
+        Run fn() (one model request) under the scheduler. Non-retryable
+        errors are raised as is; running out of attempts, budget or queue
+        time raises ModelUnavailableError.
+        """
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            try:
+                result = await self._attempt(call, fn, hedge)
+            except ModelUnavailableError:
+                MODEL_CALLS.inc(call=call, outcome="unavailable")
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    MODEL_CALLS.inc(call=call, outcome="error")
+                    raise
+                if attempt >= self.max_attempts or not self.budget.withdraw():
+                    MODEL_CALLS.inc(call=call, outcome="unavailable")
+                    raise ModelUnavailableError(
+                        f"Model unavailable after {attempt} attempt(s): "
+                        f"{str(e) or type(e).__name__}"
+                    ) from e
+
+                delay = random.uniform(
+                    0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+                )
+                logger.warning(
+                    f"Model {call} call failed ({str(e) or type(e).__name__}), "
+                    f"retrying in {delay:.2f}s"
+                )
+                MODEL_RETRIES.inc(call=call)
+                attempt += 1
+                await asyncio.sleep(delay)
+            else:
+                MODEL_CALLS.inc(call=call, outcome="ok")
+                return result
+
+    @asynccontextmanager
+    async def slot(self, call: str):
+        """
+        Hold a concurrency slot for a streamed call. Streams are not
+        retried, since part of the answer may already have been sent.
+        """
+        await self._acquire(call)
+        started = time.monotonic()
+        try:
+            if self.bucket is not None:
+                await self.bucket.take()
+            yield
+        except Exception as e:
+            if is_overload(e):
+                self._decrease(started)
+            raise
+        else:
+            self._increase()
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "queued": sum(1 for _, _, waiter in self._waiters if not waiter.done()),
+        }
+
+    async def _attempt(
+        self, call: str, fn: Callable[[], Awaitable[T]], hedge: bool
+    ) -> T:
+        if not hedge or self.hedge_delay <= 0:
+            return await self._single(call, fn)
+
+        tasks = {asyncio.ensure_future(self._single(call, fn))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done and self.budget.withdraw():
+                MODEL_HEDGES.inc(call=call)
+                tasks.add(asyncio.ensure_future(self._single(call, fn)))
+
+            error: Optional[BaseException] = None
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _single(self, call: str, fn: Callable[[], Awaitable[T]]) -> T:
+        await self._acquire(call)
+        started = time.monotonic()
+        try:
+            if self.bucket is not None:
+                await self.bucket.take()
+            result = await asyncio.wait_for(fn(), self.call_timeout)
+        except Exception as e:
+            if is_overload(e):
+                self._decrease(started)
+            raise
+        finally:
+            self._release()
+
+        self._increase()
+        return result
+
+    async def _acquire(self, call: str) -> None:
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if self._in_flight < int(self.limit) and not self._waiters:
+            self._in_flight += 1
+            MODEL_QUEUE_WAIT.observe(0, call=call)
+            return
+
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._waiters,
+            (PRIORITIES.get(call, len(PRIORITIES)), next(self._sequence), waiter),
+        )
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ModelUnavailableError(
+                f"No model capacity within {self.queue_timeout}s "
+                f"({self._in_flight} calls in flight)"
+            )
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as the caller went away
+                self._release()
+            raise
+        MODEL_QUEUE_WAIT.observe(time.perf_counter() - start, call=call)
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._waiters and self._in_flight < int(self.limit):
+            _, _, waiter = heapq.heappop(self._waiters)
+            if waiter.done():
+                # Timed out or cancelled while queued
+                continue
+            self._in_flight += 1
+            waiter.set_result(None)
+
+    def _increase(self) -> None:
+        if self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._dispatch()
+
+    def _decrease(self, started: float) -> None:
+        # Calls sent before the last decrease saw the old limit; counting
+        # their failures again would collapse the limit on a single burst
+        if started < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self.limit = max(self.min_limit, self.limit / 2)
+        logger.warning(
+            f"Model overloaded, concurrency limit lowered to {self.limit:.1f}"
+        )
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Replication state of a replica. status is only visible to roles with
+# pg_read_all_stats (e.g. via pg_monitor); others see just the pid.
+REPLICA_STATUS_SQL = """
+SELECT
+    pg_is_in_recovery() AS in_recovery,
+    (SELECT pid FROM pg_stat_wal_receiver) AS receiver_pid,
+    (SELECT status FROM pg_stat_wal_receiver) AS receiver_status,
+    pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() AS caught_up,
+    extract(epoch FROM now() - pg_last_xact_replay_timestamp()) AS replay_age
+"""
+
+READS = REGISTRY.counter(
+    "db_reads_total",
+    "Read statements by the engine that served them (a replica or primary)",
+    ["target"],
+)
+
+
+class ReplicationStopped(Exception):
+    """
+    The replica is not receiving WAL, so its data is of unknown age
+    """
+
+
+def replication_lag(row) -> float:
+    """
+    Seconds a replica is behind the primary, from a REPLICA_STATUS_SQL row.
+
+    A server not in recovery is standalone and never lags. Otherwise the
+    WAL receiver must be running: with it gone (or visibly not streaming)
+    the receive position freezes and equals the replay position, which
+    would read as caught up, so ReplicationStopped is raised. A streaming
+    replica that replayed everything it received is current (on an idle
+    primary the last replay timestamp keeps ageing without any real lag).
+    When streaming cannot be confirmed, the age of the last replayed
+    transaction is used.
+    """
+    if not row.in_recovery:
+        return 0.0
+    if row.receiver_pid is None:
+        raise ReplicationStopped("no WAL receiver running")
+    if row.receiver_status is not None and row.receiver_status != "streaming":
+        raise ReplicationStopped(f"WAL receiver is {row.receiver_status}")
+    if row.receiver_status == "streaming" and row.caught_up:
+        return 0.0
+    if row.replay_age is None:
+        raise ReplicationStopped("no transaction replayed yet")
+    return max(0.0, float(row.replay_age))
+
+
+class Replica:
+    """
+    A read replica's engine and routing state
+    """
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        # Reads waiting for or holding a connection of this replica
+        self.outstanding = 0
+        self.in_rotation = False
+        self.lag_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[str] = None
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self.engine.pool
+        return {
+            "in_rotation": self.in_rotation,
+            "outstanding": self.outstanding,
+            "lag_seconds": self.lag_seconds,
+            "error": self.error,
+            "checked_at": self.checked_at,
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+        }
+
+
+class ReplicaSet:
+    """
+    Read replicas and the choice of which one serves the next read.
+
+    Reads go to the replica in rotation with the fewest outstanding reads
+    (ties broken at random), which steers load away from a replica that is
+    slow or short of connections. A background task checks every replica
+    each interval_seconds: it is in rotation while the check passes and its
+    replay lag is at most max_lag_seconds. Replicas start out of rotation
+    until their first check, and one whose connection fails is taken out
+    at once until its next passing check.
+    """
+
+    def __init__(
+        self,
+        max_lag_seconds: float = 30,
+        interval_seconds: float = 5,
+        timeout_seconds: float = 3,
+    ):
+        self.max_lag_seconds = max_lag_seconds
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+
+        self.replicas: List[Replica] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.replicas)
+
+    def add(self, name: str, engine) -> Replica:
+        replica = Replica(name, engine)
+        self.replicas.append(replica)
+        return replica
+
+    def pick(self) -> Optional[Replica]:
+        """
+        Least busy replica in rotation, or None when there is none
+        """
+        candidates = [r for r in self.replicas if r.in_rotation]
+        if not candidates:
+            return None
+        least = min(r.outstanding for r in candidates)
+        return random.choice([r for r in candidates if r.outstanding == least])
+
+    def mark_down(self, replica: Replica, error: str) -> None:
+        if replica.in_rotation:
+            logger.warning(f"Replica {replica.name} out of rotation: {error}")
+        replica.in_rotation = False
+        replica.error = error
+
+    def start(self) -> None:
+        if self.replicas and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self) -> None:
+        """
+        Check every replica once, concurrently
+        """
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def close(self) -> None:
+        await self.stop()
+        await asyncio.gather(*(r.engine.dispose() for r in self.replicas))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {replica.name: replica.stats() for replica in self.replicas}
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Replica check failed: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def _check(self, replica: Replica) -> None:
+        start = time.perf_counter()
+        try:
+            lag = await asyncio.wait_for(self._lag(replica), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            lag, error = None, f"check timed out after {self.timeout_seconds}s"
+        except Exception as e:
+            lag, error = None, str(e) or type(e).__name__
+        else:
+            error = None
+            if lag > self.max_lag_seconds:
+                error = f"lag {lag:.1f}s over {self.max_lag_seconds}s"
+
+        replica.lag_seconds = lag
+        replica.checked_at = datetime.utcnow().isoformat()
+        if error:
+            self.mark_down(replica, error)
+            return
+
+        if not replica.in_rotation:
+            logger.info(
+                f"Replica {replica.name} in rotation "
+                f"(lag {lag:.1f}s, checked in "
+                f"{(time.perf_counter() - start) * 1000:.0f}ms)"
+            )
+        replica.in_rotation = True
+        replica.error = None
+
+    async def _lag(self, replica: Replica) -> float:
+        async with replica.engine.connect() as conn:
+            result = await conn.execute(text(REPLICA_STATUS_SQL))
+            return replication_lag(result.one())
@@ -0,0 +1,298 @@
+import hashlib
+import json
+import logging
+import math
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional
+
+from cache import LRUCache
+from result_set import ResultSet, row_size
+from sql_utils import canonicalize_sql, referenced_tables
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCacheBackend(ABC):
+    """
+    Storage interface for cached result sets.
+
+    Tables carry a version counter; cache keys embed the versions of the
+    tables a statement references, so bumping a version invalidates every
+    entry that read the table without tracking individual keys.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def set(
+        self, key: str, entry: Dict[str, Any], ttl_seconds: float
+    ) -> None: ...
+
+    @abstractmethod
+    async def get_versions(self, tables: Iterable[str]) -> Dict[str, int]: ...
+
+    @abstractmethod
+    async def bump_versions(self, tables: Iterable[str]) -> None: ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    async def close(self) -> None:
+        pass
+
+
+class InProcessBackend(ResultCacheBackend):
+    """
+    Per-instance LRU bounded by an approximate byte budget
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int = 4096):
+        self._cache = LRUCache(max_entries=max_entries, max_bytes=max_bytes)
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl_seconds: float) -> None:
+        self._cache.set(key, entry, size=entry["size"], ttl_seconds=ttl_seconds)
+
+    async def get_versions(self, tables: Iterable[str]) -> Dict[str, int]:
+        return {table: self._versions.get(table, 0) for table in tables}
+
+    async def bump_versions(self, tables: Iterable[str]) -> None:
+        for table in tables:
+            self._versions[table] = self._versions.get(table, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+# Column value types that survive a round trip through the shared store,
+# keyed by exact type: name, encode, decode
+_VALUE_CODECS = {
+    datetime: ("datetime", datetime.isoformat, datetime.fromisoformat),
+    date: ("date", date.isoformat, date.fromisoformat),
+    dt_time: ("time", dt_time.isoformat, dt_time.fromisoformat),
+    timedelta: (
+        "timedelta",
+        lambda v: [v.days, v.seconds, v.microseconds],
+        lambda v: timedelta(*v),
+    ),
+    Decimal: ("decimal", str, Decimal),
+    uuid.UUID: ("uuid", str, uuid.UUID),
+    bytes: ("bytes", bytes.hex, bytes.fromhex),
+}
+_VALUE_DECODERS = {name: decode for name, _, decode in _VALUE_CODECS.values()}
+
+
+def _encode_value(value: Any) -> Dict[str, Any]:
+    codec = _VALUE_CODECS.get(type(value))
+    if codec is None:
+        raise TypeError(f"{type(value).__name__} values cannot be cached")
+    name, encode, _ = codec
+    return {"__type__": name, "value": encode(value)}
+
+
+def _decode_value(obj: Dict[str, Any]) -> Any:
+    decode = _VALUE_DECODERS.get(obj.get("__type__"))
+    if decode is None or len(obj) != 2:
+        return obj
+    return decode(obj["value"])
+
+
+class SharedStoreBackend(ResultCacheBackend):
+    """
+    Backend for a shared key-value store (e.g. Redis or Memorystore).
+
+    The store must provide async get(key) -> Optional[str],
+    set(key, value, ttl_seconds) and incr(key) -> int. Entries are JSON,
+    with dates, times, decimals, UUIDs and bytes tagged so they come back
+    with their types; results holding any other non-JSON value are not
+    cached.
+    """
+
+    def __init__(self, store, prefix: str = "resultcache"):
+        self.store = store
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = await self.store.get(f"{self.prefix}:entry:{key}")
+        if value is None:
+            return None
+
+        entry = json.loads(value, object_hook=_decode_value)
+        result = ResultSet.from_columnar(entry["result"])
+        result.truncated = entry["truncated"]
+        entry["result"] = result
+        return entry
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl_seconds: float) -> None:
+        result = entry["result"]
+        payload = dict(entry, result=result.to_columnar(), truncated=result.truncated)
+        try:
+            value = json.dumps(payload, default=_encode_value)
+        except TypeError as e:
+            logger.debug(f"Result not cached: {str(e)}")
+            return
+        await self.store.set(f"{self.prefix}:entry:{key}", value, ttl_seconds)
+
+    async def get_versions(self, tables: Iterable[str]) -> Dict[str, int]:
+        versions = {}
+        for table in tables:
+            value = await self.store.get(f"{self.prefix}:version:{table}")
+            versions[table] = int(value) if value is not None else 0
+        return versions
+
+    async def bump_versions(self, tables: Iterable[str]) -> None:
+        for table in tables:
+            await self.store.incr(f"{self.prefix}:version:{table}")
+
+    async def close(self) -> None:
+        close = getattr(self.store, "close", None)
+        if close is not None:
+            await close()
+
+
+class RedisStore:
+    """
+    Shared store on Redis or Memorystore, for SharedStoreBackend. The redis
+    package is imported only when this store is configured.
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: str, ttl_seconds: Optional[float]) -> None:
+        await self._client.set(
+            key, value, ex=math.ceil(ttl_seconds) if ttl_seconds else None
+        )
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(key)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class InMemoryStore:
+    """
+    Local stand-in for a shared key-value store, used with SharedStoreBackend
+    """
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        value, expires_at = self._data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    async def set(self, key: str, value: str, ttl_seconds: Optional[float]) -> None:
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds else None
+        self._data[key] = (value, expires_at)
+
+    async def incr(self, key: str) -> int:
+        value = int(await self.get(key) or 0) + 1
+        self._data[key] = (str(value), None)
+        return value
+
+
+class ResultCache:
+    """
+    Cache of executed SELECT results keyed on canonicalized SQL text
+    """
+
+    def __init__(self, backend: ResultCacheBackend, ttl_seconds: float = 60):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    async def key_for(self, sql: str) -> Optional[str]:
+        """
+        Cache key for a statement under the current table versions, or None
+        when the versions cannot be read and the statement must run
+        uncached. Compute it before executing so a concurrent invalidation
+        is never masked.
+        """
+        canonical = canonicalize_sql(sql)
+        try:
+            versions = await self.backend.get_versions(sorted(referenced_tables(sql)))
+        except Exception as e:
+            logger.error(f"Result cache version lookup failed: {str(e)}")
+            return None
+        version_key = ",".join(f"{t}={v}" for t, v in versions.items())
+        return hashlib.sha256(f"{version_key}\n{canonical}".encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return {"result": ResultSet, "cached_at": iso timestamp} or None
+        """
+        try:
+            entry = await self.backend.get(key)
+        except Exception as e:
+            logger.error(f"Result cache lookup failed: {str(e)}")
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry
+
+    async def set(self, key: str, result: ResultSet) -> None:
+        size = sum(row_size(row) for row in result.rows)
+        entry = {
+            "result": result,
+            "cached_at": datetime.utcnow().isoformat(),
+            "size": size,
+        }
+
+        try:
+            await self.backend.set(key, entry, self.ttl_seconds)
+        except Exception as e:
+            logger.error(f"Result cache store failed: {str(e)}")
+
+    async def invalidate(self, tables: Iterable[str]) -> bool:
+        """
+        Bump the versions of tables; False when the backend failed, in which
+        case their entries stay until the TTL runs out
+        """
+        tables = sorted(set(tables))
+        if not tables:
+            return True
+        try:
+            await self.backend.bump_versions(tables)
+        except Exception as e:
+            logger.error(f"Result cache invalidation failed for {tables}: {str(e)}")
+            return False
+        logger.info(f"Result cache invalidated for tables: {tables}")
+        return True
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = dict(self.backend.stats())
+        stats.update(
+            {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+        )
+        return stats
@@ -0,0 +1,52 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+
+class ResultSet:
+    """
+    Compact query result: column names stored once, rows as plain tuples.
+    truncated is set when the row or byte cap stopped the fetch early.
+    """
+
+    __slots__ = ("columns", "rows", "truncated")
+
+    def __init__(
+        self,
+        columns: Sequence[str],
+        rows: Optional[List[tuple]] = None,
+        truncated: bool = False,
+    ):
+        self.columns = list(columns)
+        self.rows = rows if rows is not None else []
+        self.truncated = truncated
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def extend(self, other: "ResultSet") -> None:
+        self.rows.extend(other.rows)
+        self.truncated = self.truncated or other.truncated
+
+    def to_dicts(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        rows = self.rows if limit is None else self.rows[:limit]
+        return [dict(zip(self.columns, row)) for row in rows]
+
+    def to_columnar(self) -> Dict[str, Any]:
+        """
+        Column-major shape: {"columns": [...], "data": [[col0...], [col1...]]}
+        """
+        if self.rows:
+            data = [list(values) for values in zip(*self.rows)]
+        else:
+            data = [[] for _ in self.columns]
+        return {"columns": self.columns, "data": data}
+
+    @classmethod
+    def from_columnar(cls, payload: Dict[str, Any]) -> "ResultSet":
+        return cls(payload["columns"], [tuple(row) for row in zip(*payload["data"])])
+
+
+def row_size(row: Sequence[Any]) -> int:
+    """
+    Cheap estimate of a row's payload size in bytes
+    """
+    return sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in row)
@@ -0,0 +1,116 @@
+import asyncio
+import contextvars
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from schema_context import SchemaIndex
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SchemaSnapshot:
+    """
+    Introspected schema plus its prompt-ready serialization (compact DDL
+    for every table) and the index used to prune it per question
+    """
+
+    schema: Dict[str, Any]
+    prompt: str
+    fingerprint: str
+    index: Optional[SchemaIndex] = None
+    loaded_at: float = field(default_factory=time.monotonic)
+
+
+class SchemaCache:
+    """
+    Process-level schema cache.
+
+    The first caller loads the schema; concurrent callers share that load.
+    Once the TTL expires the current snapshot keeps being served while a
+    background task compares the catalog fingerprint and reloads only if
+    the schema actually changed; on_change(old_schema, new_schema) is then
+    awaited.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[Dict[str, Any]]],
+        fingerprinter: Callable[[], Awaitable[str]],
+        ttl_seconds: float = 300,
+        max_columns: int = 40,
+        on_change: Optional[
+            Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[None]]
+        ] = None,
+    ):
+        self._loader = loader
+        self._fingerprinter = fingerprinter
+        self.ttl_seconds = ttl_seconds
+        self.max_columns = max_columns
+        self.on_change = on_change
+
+        self._snapshot: Optional[SchemaSnapshot] = None
+        self._checked_at = 0.0
+        self._flight = SingleFlight()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def get(self) -> SchemaSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return await self._flight.do("load", self._load)
+
+        if time.monotonic() - self._checked_at > self.ttl_seconds:
+            if self._refresh_task is None or self._refresh_task.done():
+                # Not part of the request that noticed the expiry: run it
+                # without that request's ID and stage timings
+                self._refresh_task = asyncio.create_task(
+                    self._revalidate(), context=contextvars.Context()
+                )
+
+        return snapshot
+
+    def invalidate(self) -> None:
+        """
+        Drop the cached snapshot so the next caller reloads it
+        """
+        self._snapshot = None
+
+    async def _load(self) -> SchemaSnapshot:
+        fingerprint = await self._fingerprinter()
+        schema = await self._loader()
+        index = SchemaIndex(schema, max_columns=self.max_columns)
+
+        snapshot = SchemaSnapshot(
+            schema=schema,
+            prompt=index.full_prompt,
+            fingerprint=fingerprint,
+            index=index,
+        )
+        self._snapshot = snapshot
+        self._checked_at = time.monotonic()
+
+        logger.info(
+            f"Schema cache loaded: {len(schema)} tables, ~{index.full_tokens} tokens"
+        )
+        return snapshot
+
+    async def _revalidate(self) -> None:
+        try:
+            fingerprint = await self._fingerprinter()
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.fingerprint == fingerprint:
+                self._checked_at = time.monotonic()
+                return
+
+            logger.info("Schema fingerprint changed, reloading schema cache")
+            reloaded = await self._flight.do("load", self._load)
+            if self.on_change is not None and snapshot is not None:
+                await self.on_change(snapshot.schema, reloaded.schema)
+
+        except Exception as e:
+            # Keep serving the old snapshot and retry after another TTL
+            self._checked_at = time.monotonic()
+            logger.error(f"Schema cache refresh failed: {str(e)}")
@@ -0,0 +1,211 @@
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sql_cache import cosine, embed
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CAMEL_RE = re.compile(r"([a-z0-9])([A-Z])")
+
+# Question words that would otherwise match columns like is_active or created_by
+_STOPWORDS = {
+    "a", "all", "an", "and", "are", "at", "by", "each", "find", "for", "from",
+    "get", "give", "how", "in", "is", "list", "many", "me", "much", "of", "on",
+    "or", "per", "show", "the", "to", "was", "were", "what", "which", "who",
+    "with",
+}  # fmt: skip
+
+# Rough characters per token for identifier-heavy text
+CHARS_PER_TOKEN = 4
+
+# Embedding similarity that makes a table relevant without a term match
+MIN_SIMILARITY = 0.25
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def terms(text: str) -> Set[str]:
+    """
+    Lowercased words of a question or identifier. snake_case and camelCase
+    are split and plurals also contribute their singular form.
+    """
+    words = _WORD_RE.findall(_CAMEL_RE.sub(r"\1 \2", text).lower())
+
+    result = set()
+    for word in words:
+        if word in _STOPWORDS:
+            continue
+        result.add(word)
+        if len(word) > 4 and word.endswith("ies"):
+            result.add(word[:-3] + "y")
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            result.add(word[:-1])
+    return result
+
+
+def render_table(
+    name: str, info: Dict[str, Any], keep: Optional[Set[str]] = None
+) -> str:
+    """
+    Compact CREATE TABLE statement for the prompt. With keep, only those
+    columns are listed and the rest are summarized in a trailing comment.
+    """
+    primary_key = set((info.get("primary_key") or {}).get("constrained_columns") or [])
+
+    references, composite = {}, []
+    for fk in info.get("foreign_keys") or []:
+        target = f"{fk['referred_table']}({', '.join(fk['referred_columns'])})"
+        if len(fk["constrained_columns"]) == 1:
+            references[fk["constrained_columns"][0]] = target
+        else:
+            columns = ", ".join(fk["constrained_columns"])
+            composite.append(f"FOREIGN KEY ({columns}) REFERENCES {target}")
+
+    lines = []
+    for column in info["columns"]:
+        if keep is not None and column["name"] not in keep:
+            continue
+        line = f"{column['name']} {column['type']}"
+        if column["name"] in primary_key and len(primary_key) == 1:
+            line += " PRIMARY KEY"
+        elif not column.get("nullable", True):
+            line += " NOT NULL"
+        if column["name"] in references:
+            line += f" REFERENCES {references[column['name']]}"
+        if column.get("comment"):
+            line += f" -- {column['comment']}"
+        lines.append(line)
+
+    if len(primary_key) > 1:
+        lines.append(f"PRIMARY KEY ({', '.join(sorted(primary_key))})")
+    lines.extend(composite)
+
+    last = len(lines) - 1
+    if keep is not None and len(keep) < len(info["columns"]):
+        lines.append(f"-- {len(info['columns']) - len(keep)} more columns omitted")
+
+    header = f"CREATE TABLE {name} ("
+    if info.get("comment"):
+        header += f" -- {info['comment']}"
+
+    body = []
+    for i, line in enumerate(lines):
+        # Commas go before any trailing comment so the DDL stays valid
+        text, sep, comment = line.partition(" -- ")
+        if i < last:
+            text += ","
+        body.append(f"  {text}{sep}{comment}")
+
+    return "\n".join([header, *body, ");"])
+
+
+class SchemaIndex:
+    """
+    Retrieval index over an introspected schema.
+
+    Table and column names (and comments) are tokenized and embedded once
+    per schema snapshot. select() scores every table against a question,
+    adds the foreign-key neighbours of the matches and serializes as many
+    of them as fit in a token budget as compact DDL. When the whole schema
+    fits, it is sent as is.
+    """
+
+    def __init__(self, schema: Dict[str, Any], max_columns: int = 40):
+        self.schema = schema
+        self.max_columns = max_columns
+
+        self._ddl: Dict[str, str] = {}
+        self._table_terms: Dict[str, Set[str]] = {}
+        self._column_terms: Dict[str, List[Tuple[str, Set[str]]]] = {}
+        self._embeddings: Dict[str, Dict[int, float]] = {}
+        self._neighbors: Dict[str, Set[str]] = {name: set() for name in schema}
+
+        for name, info in schema.items():
+            self._ddl[name] = render_table(name, info)
+            self._table_terms[name] = terms(name)
+            self._column_terms[name] = [
+                (column["name"], terms(column["name"])) for column in info["columns"]
+            ]
+
+            words = terms(name) | terms(info.get("comment") or "")
+            for column in info["columns"]:
+                words |= terms(column["name"]) | terms(column.get("comment") or "")
+            self._embeddings[name] = embed(" ".join(sorted(words)))
+
+            for fk in info.get("foreign_keys") or []:
+                if fk["referred_table"] in self._neighbors:
+                    self._neighbors[name].add(fk["referred_table"])
+                    self._neighbors[fk["referred_table"]].add(name)
+
+        self.full_prompt = "\n\n".join(self._ddl.values())
+        self.full_tokens = estimate_tokens(self.full_prompt)
+
+    def select(self, question: str, token_budget: int) -> str:
+        """
+        Schema prompt for a question, at most token_budget tokens
+        (estimated). A budget of 0 or less disables pruning.
+        """
+        if token_budget <= 0 or self.full_tokens <= token_budget:
+            return self.full_prompt
+
+        question_terms = terms(question)
+        question_embedding = embed(" ".join(sorted(question_terms)))
+
+        scores: Dict[str, float] = {}
+        relevant = []
+        for name in self.schema:
+            name_hits = len(question_terms & self._table_terms[name])
+            column_hits = sum(
+                1 for _, words in self._column_terms[name] if question_terms & words
+            )
+            similarity = cosine(question_embedding, self._embeddings[name])
+            scores[name] = 3 * name_hits + column_hits + similarity
+            if name_hits or column_hits or similarity >= MIN_SIMILARITY:
+                relevant.append(name)
+
+        relevant.sort(key=lambda name: scores[name], reverse=True)
+        if relevant:
+            neighbors = {n for name in relevant for n in self._neighbors[name]}
+            neighbors -= set(relevant)
+            candidates = relevant + sorted(
+                neighbors, key=lambda name: scores[name], reverse=True
+            )
+        else:
+            # Nothing matched, let the model pick from the closest tables
+            candidates = sorted(
+                self.schema, key=lambda name: scores[name], reverse=True
+            )
+
+        parts, used = [], 0
+        for name in candidates:
+            ddl = self._render(name, question_terms)
+            tokens = estimate_tokens(ddl) + 1
+            if used + tokens > token_budget:
+                continue
+            parts.append(ddl)
+            used += tokens
+
+        omitted = len(self.schema) - len(parts)
+        if omitted:
+            parts.append(f"-- {omitted} other tables omitted")
+        return "\n\n".join(parts)
+
+    def _render(self, name: str, question_terms: Set[str]) -> str:
+        info = self.schema[name]
+        if len(info["columns"]) <= self.max_columns:
+            return self._ddl[name]
+
+        # Keys first, then columns the question mentions, then in table order
+        keep = set((info.get("primary_key") or {}).get("constrained_columns") or [])
+        for fk in info.get("foreign_keys") or []:
+            keep.update(fk["constrained_columns"])
+        for column, words in self._column_terms[name]:
+            if question_terms & words:
+                keep.add(column)
+        for column, _ in self._column_terms[name]:
+            if len(keep) >= self.max_columns:
+                break
+            keep.add(column)
+
+        return render_table(name, info, keep)
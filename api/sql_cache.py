@@ -0,0 +1,176 @@
+import hashlib
+import json
+import math
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from cache import LRUCache
+
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+EMBEDDING_DIM = 512
+
+
+def normalize_query(query: str) -> str:
+    """
+    Lowercase, collapse whitespace and drop trailing punctuation
+    """
+    return " ".join(query.lower().split()).rstrip("?.!; ")
+
+
+def embed(text: str) -> Dict[int, float]:
+    """
+    Local hashed bag-of-words/char-trigram embedding, L2 normalized.
+    Cheap enough to compute on every request and needs no model download.
+    """
+    features: Dict[int, float] = {}
+    for word in _WORD_RE.findall(text):
+        tokens = [word] + [word[i : i + 3] for i in range(max(len(word) - 2, 1))]
+        for token in tokens:
+            digest = hashlib.blake2b(token.encode(), digest_size=4).digest()
+            index = int.from_bytes(digest, "little") % EMBEDDING_DIM
+            features[index] = features.get(index, 0.0) + 1.0
+
+    norm = math.sqrt(sum(v * v for v in features.values()))
+    if not norm:
+        return {}
+    return {k: v / norm for k, v in features.items()}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class SQLCache:
+    """
+    Two-tier cache for generated SQL.
+
+    The exact tier is keyed on the normalized question, the request context
+    and the schema fingerprint. The optional similarity tier compares local
+    embeddings of questions asked against the same context and schema and
+    reuses the SQL of the closest one above the configured threshold.
+    Questions containing different numbers never match by similarity, and
+    nothing is cached while the schema fingerprint is unknown.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: Optional[int] = 4 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 3600,
+        similarity_threshold: Optional[float] = None,
+    ):
+        self.exact = LRUCache(
+            max_entries=max_entries, max_bytes=max_bytes, ttl_seconds=ttl_seconds
+        )
+        self.similarity_threshold = similarity_threshold
+
+        # key -> (partition, vector, numbers); bounded like the exact tier
+        self._index: "OrderedDict[str, Tuple[str, Dict[int, float], tuple]]" = (
+            OrderedDict()
+        )
+        self._fingerprint: Optional[str] = None
+
+        self.similar_hits = 0
+
+    def get(
+        self,
+        query: str,
+        context: Optional[Dict[str, Any]],
+        fingerprint: str,
+    ) -> Optional[str]:
+        if not fingerprint:
+            return None
+        self._check_fingerprint(fingerprint)
+
+        normalized = normalize_query(query)
+        partition = self._partition(context, fingerprint)
+        key = self._key(normalized, partition)
+
+        sql = self.exact.get(key)
+        if sql is not None or not self.similarity_threshold:
+            return sql
+
+        match = self._nearest(normalized, partition)
+        if match is None:
+            return None
+
+        sql = self.exact.get(match)
+        if sql is None:
+            self._index.pop(match, None)
+            return None
+
+        # The miss recorded by the exact lookup above turned into a hit
+        self.exact.misses -= 1
+        self.similar_hits += 1
+        return sql
+
+    def set(
+        self,
+        query: str,
+        context: Optional[Dict[str, Any]],
+        fingerprint: str,
+        sql: str,
+    ) -> None:
+        if not fingerprint:
+            return
+        self._check_fingerprint(fingerprint)
+
+        normalized = normalize_query(query)
+        partition = self._partition(context, fingerprint)
+        key = self._key(normalized, partition)
+
+        self.exact.set(key, sql, size=len(key) + len(sql))
+
+        if self.similarity_threshold:
+            self._index[key] = (
+                partition,
+                embed(normalized),
+                tuple(_NUMBER_RE.findall(normalized)),
+            )
+            self._index.move_to_end(key)
+            while len(self._index) > self.exact.max_entries:
+                self._index.popitem(last=False)
+
+    def clear(self) -> None:
+        self.exact.clear()
+        self._index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.exact.stats()
+        stats["similar_hits"] = self.similar_hits
+        return stats
+
+    def _check_fingerprint(self, fingerprint: str) -> None:
+        # Every entry belongs to one schema; a new fingerprint retires them all
+        if fingerprint != self._fingerprint:
+            if self._fingerprint is not None:
+                self.clear()
+            self._fingerprint = fingerprint
+
+    def _nearest(self, normalized: str, partition: str) -> Optional[str]:
+        vector = embed(normalized)
+        numbers = tuple(_NUMBER_RE.findall(normalized))
+
+        best_key, best_score = None, self.similarity_threshold
+        for key, (entry_partition, entry_vector, entry_numbers) in self._index.items():
+            if entry_partition != partition or entry_numbers != numbers:
+                continue
+            score = cosine(vector, entry_vector)
+            if score >= best_score:
+                best_key, best_score = key, score
+
+        return best_key
+
+    @staticmethod
+    def _partition(context: Optional[Dict[str, Any]], fingerprint: str) -> str:
+        context_json = json.dumps(context, sort_keys=True, default=str)
+        return f"{fingerprint}:{hashlib.sha256(context_json.encode()).hexdigest()}"
+
+    @staticmethod
+    def _key(normalized: str, partition: str) -> str:
+        return hashlib.sha256(f"{partition}\n{normalized}".encode()).hexdigest()
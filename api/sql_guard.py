@@ -0,0 +1,160 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from cache import LRUCache
+from sql_utils import canonicalize_sql, split_literals
+
+_START_RE = re.compile(r"^\(*\s*(select|with)\b", re.IGNORECASE)
+
+# Keywords that can only appear in statements that write or lock: data
+# modifying CTEs, SELECT ... INTO and FOR UPDATE/SHARE
+_WRITE_RE = re.compile(
+    r"\b(insert|update|delete|merge|into|truncate|drop|alter|create|grant|revoke)\b"
+    r"|\bfor\s+(?:no\s+key\s+update|key\s+share|share)\b",
+    re.IGNORECASE,
+)
+
+# Functions with side effects or that reach outside the database
+_FUNCTION_RE = re.compile(
+    r"\b(pg_sleep\w*|pg_terminate_backend|pg_cancel_backend|pg_reload_conf"
+    r"|pg_read_file|pg_read_binary_file|pg_ls_dir|pg_stat_file|pg_advisory\w*"
+    r"|lo_\w+|dblink\w*|set_config|nextval|setval|query_to_xml\w*)\s*\(",
+    re.IGNORECASE,
+)
+
+# Quote or comment characters outside any complete literal or comment
+_UNBALANCED_RE = re.compile(r"['\"$]|/\*|\*/")
+
+_LIMIT_RE = re.compile(r"\blimit\s+(?P<value>\d+|all\b|\S+)", re.IGNORECASE)
+_FETCH_RE = re.compile(r"\bfetch\s+(?:first|next)\b", re.IGNORECASE)
+
+
+class SQLGuardError(ValueError):
+    """
+    Generated SQL rejected before execution
+    """
+
+
+def _mask_literals(sql: str) -> str:
+    """
+    Same-length copy of sql with the contents of string literals and quoted
+    identifiers blanked, so keyword matches keep their positions
+    """
+    return "".join(
+        chunk if i % 2 == 0 else chunk[0] + " " * (len(chunk) - 2) + chunk[-1]
+        for i, chunk in enumerate(split_literals(sql))
+    )
+
+
+def _top_level(masked: str, matches) -> List[re.Match]:
+    """
+    Matches that are not nested inside parentheses
+    """
+    depth, pos, result = 0, 0, []
+    for match in matches:
+        segment = masked[pos : match.start()]
+        depth += segment.count("(") - segment.count(")")
+        pos = match.start()
+        if depth == 0:
+            result.append(match)
+    return result
+
+
+class SQLGuard:
+    """
+    Local checks for generated SQL before it reaches Postgres.
+
+    Only a single SELECT (or WITH ... SELECT) statement is accepted; write
+    keywords, locking clauses and side-effecting functions are rejected.
+    The outermost LIMIT is injected or clamped to max_limit. Verdicts are
+    cached by statement text so repeated SQL skips re-parsing.
+    """
+
+    def __init__(self, max_limit: int, cache_entries: int = 1024):
+        self.max_limit = max_limit
+        self._cache = LRUCache(max_entries=cache_entries)
+        self.rejected = 0
+
+    def validate(self, sql: str) -> str:
+        """
+        Return the statement to execute, or raise SQLGuardError
+        """
+        verdict = self._cache.get(sql)
+        if verdict is None:
+            try:
+                verdict = (True, self._rewrite(sql))
+            except SQLGuardError as e:
+                verdict = (False, str(e))
+            self._cache.set(sql, verdict, size=len(sql) + len(verdict[1]))
+
+        ok, value = verdict
+        if not ok:
+            self.rejected += 1
+            raise SQLGuardError(value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "rejected": self.rejected}
+
+    def _rewrite(self, sql: str) -> str:
+        statement = canonicalize_sql(sql)
+        masked = _mask_literals(statement)
+
+        if not statement:
+            raise SQLGuardError("Empty SQL statement")
+        chunks = split_literals(statement)
+        if any(chunk[0] in "eE$" for chunk in chunks[1::2]):
+            # Tokenized correctly, but generated queries have no use for
+            # them and they are how literal boundaries get confused
+            raise SQLGuardError(
+                "Escape strings and dollar quoting are not allowed in queries"
+            )
+        if any(_UNBALANCED_RE.search(chunk) for chunk in chunks[::2]):
+            raise SQLGuardError("Unterminated quote or comment in SQL statement")
+        if ";" in masked:
+            raise SQLGuardError("Only a single SQL statement is allowed")
+        if not _START_RE.match(masked):
+            raise SQLGuardError("Only SELECT queries are allowed")
+
+        match = _WRITE_RE.search(masked)
+        if match:
+            raise SQLGuardError(f"'{match.group().upper()}' is not allowed in queries")
+        match = _FUNCTION_RE.search(masked)
+        if match:
+            raise SQLGuardError(f"Function {match.group(1)}() is not allowed")
+
+        return self._apply_limit(statement, masked)
+
+    def _apply_limit(self, statement: str, masked: str) -> str:
+        limits = _top_level(masked, _LIMIT_RE.finditer(masked))
+        fetches = _top_level(masked, _FETCH_RE.finditer(masked))
+
+        if not limits and not fetches:
+            return f"{statement} LIMIT {self.max_limit}"
+
+        if len(limits) == 1 and not fetches:
+            match = limits[0]
+            value = match.group("value")
+            if value.isdigit():
+                if int(value) <= self.max_limit:
+                    return statement
+                start, end = match.span("value")
+                return f"{statement[:start]}{self.max_limit}{statement[end:]}"
+
+        # LIMIT ALL, a parameter, an expression or FETCH FIRST: cap from outside
+        return f"SELECT * FROM ({statement}) AS limited LIMIT {self.max_limit}"
+
+
+def plan_estimates(plan: Any) -> Optional[Dict[str, float]]:
+    """
+    Total cost and row estimate of the root node of EXPLAIN (FORMAT JSON)
+    output
+    """
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    try:
+        root = plan[0]["Plan"]
+    except (IndexError, KeyError, TypeError):
+        return None
+    return {"cost": float(root["Total Cost"]), "rows": float(root["Plan Rows"])}
@@ -0,0 +1,180 @@
+import hashlib
+import re
+from typing import Any, Dict, List, Set, Tuple
+
+# Quoted text: escape strings (E'...' with backslash escapes), dollar quotes
+# with any tag ($$...$$, $fn$...$fn$), string literals and quoted
+# identifiers. The first two must be matched whole, since read as plain
+# literals they end early or not at all and expose or hide the code around
+# them. Plain literals assume standard_conforming_strings is on.
+_STRING = (
+    r"(?<![\w$])[eE]'(?:[^'\\]|\\.|'')*'"
+    r"|(?<![\w$])\$(?P<tag>(?:[A-Za-z_][A-Za-z0-9_]*)?)\$.*?\$(?P=tag)\$"
+    r"|'(?:[^']|'')*'"
+)
+_IDENT = r'"(?:[^"]|"")*"'
+_QUOTED_RE = re.compile(rf"{_STRING}|{_IDENT}", re.DOTALL)
+
+# String literals, quoted identifiers, or runs of whitespace and comments
+_TOKEN_RE = re.compile(
+    rf"(?P<string>{_STRING})"
+    rf"|(?P<ident>{_IDENT})"
+    r"|(?P<space>(?:\s+|--[^\n]*|/\*.*?\*/)+)",
+    re.DOTALL,
+)
+
+_NAME = r'(?:"(?:[^"]|"")+"|[A-Za-z_][A-Za-z0-9_$]*)'
+_SQL_TOKEN_RE = re.compile(rf"{_NAME}|\S")
+# Keywords followed by a table reference, and those that end a FROM list
+_TABLE_KEYWORDS = {"from", "join", "into", "update"}
+_FROM_LIST_END = {
+    "where", "group", "having", "order", "limit", "offset", "fetch", "for",
+    "window", "union", "intersect", "except", "returning", "select", "values",
+    "set",
+}  # fmt: skip
+_CTE_RE = re.compile(rf"(?:\bwith|,)\s*(?:recursive\s+)?({_NAME})\s+as\s*\(", re.I)
+
+# Comparison operators, not the tail of ->>, @>, <@ and friends
+_COMPARISON = r"(?<![-#@!<>=~|&])(?:<>|!=|<=|>=|=|<|>)"
+_STRING_CONTEXT_RE = re.compile(rf"(?:{_COMPARISON}|\bi?like)\s*$", re.IGNORECASE)
+_NUMBER_RE = re.compile(
+    rf"(?P<op>{_COMPARISON}\s*)(?P<num>-?\d+(?:\.\d+)?)(?![\w.])(?!\s*::)"
+)
+
+
+def split_literals(sql: str) -> List[str]:
+    """
+    Split SQL into alternating code and quoted chunks so callers can rewrite
+    code without touching string literals or quoted identifiers
+    """
+    chunks, pos = [], 0
+    for match in _QUOTED_RE.finditer(sql):
+        chunks.append(sql[pos : match.start()])
+        chunks.append(match.group())
+        pos = match.end()
+    chunks.append(sql[pos:])
+    return chunks
+
+
+def canonicalize_sql(sql: str) -> str:
+    """
+    Normalize SQL text for use as a cache key: comments are removed,
+    whitespace outside literals is collapsed and trailing semicolons dropped
+    """
+
+    def _replace(match: re.Match) -> str:
+        return " " if match.group("space") else match.group()
+
+    return _TOKEN_RE.sub(_replace, sql).strip().rstrip(";").strip()
+
+
+def _unquote(name: str) -> str:
+    name = name.strip()
+    if name.startswith('"'):
+        return name[1:-1].replace('""', '"')
+    return name.lower()
+
+
+def referenced_tables(sql: str) -> Set[str]:
+    """
+    Best-effort set of table names a statement references (every entry
+    of a FROM list, JOIN, INTO and UPDATE targets, schema prefix removed),
+    excluding CTE names. May include a few non-table words (e.g.
+    EXTRACT(... FROM col)), which is harmless for cache invalidation.
+    """
+    code = "".join(
+        chunk if i % 2 == 0 or chunk.startswith('"') else "''"
+        for i, chunk in enumerate(split_literals(canonicalize_sql(sql)))
+    )
+
+    ctes = {_unquote(name) for name in _CTE_RE.findall(code)}
+    tokens = _SQL_TOKEN_RE.findall(code)
+    tables = set()
+    # Per parenthesis depth: inside a FROM list, where a top-level comma
+    # starts another table reference
+    in_from = [False]
+    expect_table = False
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        word = token.lower()
+        i += 1
+
+        if token == "(":
+            in_from.append(False)
+            expect_table = False
+        elif token == ")":
+            if len(in_from) > 1:
+                in_from.pop()
+        elif token == ",":
+            expect_table = in_from[-1]
+        elif word in _TABLE_KEYWORDS:
+            expect_table = True
+            if word == "from":
+                in_from[-1] = True
+        elif word in _FROM_LIST_END:
+            in_from[-1] = expect_table = False
+        elif expect_table and word not in ("lateral", "only"):
+            expect_table = False
+            if not re.match(_NAME, token):
+                continue
+            # Schema-qualified: keep the last part
+            while i + 1 < len(tokens) and tokens[i] == ".":
+                token = tokens[i + 1]
+                i += 2
+            table = _unquote(token)
+            if table not in ctes:
+                tables.add(table)
+
+    return tables
+
+
+def parameterize_sql(sql: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Replace literals compared against something (col = 'x', col > 5,
+    col LIKE 'a%') with :p1, :p2 ... bind parameters. Statements that only
+    differ in those literals share one template. Typed literals (DATE '...'),
+    decimal numbers, casts, LIMIT values and ORDER BY positions are left
+    alone.
+    """
+    params: Dict[str, Any] = {}
+
+    def _bind(value: Any) -> str:
+        name = f"p{len(params) + 1}"
+        params[name] = value
+        return f":{name}"
+
+    def _number(match: re.Match) -> str:
+        text = match.group("num")
+        if "." in text:
+            # A bound value takes the column's type: 2.5 against an integer
+            # column would be truncated and 9.99 against numeric would be
+            # inexact, while the literal compares as numeric
+            return match.group()
+        return match.group("op") + _bind(int(text))
+
+    chunks = split_literals(sql)
+    parts = []
+    for i, chunk in enumerate(chunks):
+        if i % 2 == 0:
+            parts.append(_NUMBER_RE.sub(_number, chunk))
+            continue
+
+        following = chunks[i + 1] if i + 1 < len(chunks) else ""
+        if (
+            chunk.startswith("'")
+            and _STRING_CONTEXT_RE.search(chunks[i - 1])
+            and not following.lstrip().startswith("::")
+        ):
+            parts.append(_bind(chunk[1:-1].replace("''", "'")))
+        else:
+            parts.append(chunk)
+
+    return "".join(parts), params
+
+
+def sql_fingerprint(template: str) -> str:
+    """
+    Short stable identifier for a parameterized statement
+    """
+    return hashlib.blake2b(template.encode(), digest_size=8).hexdigest()
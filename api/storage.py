@@ -1,12 +1,37 @@
 import os
+import re
 import json
+import asyncio
 import logging
-from datetime import datetime
-from typing import Dict, Any, Optional
-from google.cloud import storage
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from cache import LRUCache
+from ids import uuid7, uuid7_datetime
+from metrics import stage
+from log_pipeline import (
+    BatchLogWriter,
+    FirestoreLogIndex,
+    GCSSink,
+    LocalSink,
+    SQLiteLogIndex,
+    decode_segment,
+)
 
 logger = logging.getLogger(__name__)
 
+LOG_PREFIX = "query_logs"
+JOB_PREFIX = "jobs"
+
+# Log IDs written before logs were keyed by query_id
+_LEGACY_LOG_ID_RE = re.compile(r"^\d{8}_\d{6}_\d{6}$")
+
+
+class QueryLogLookupUnavailable(Exception):
+    """
+    Lookups by query_id need an index (or the opt-in segment scan)
+    """
+
 
 class StorageService:
     """
@@ -17,77 +42,216 @@ class StorageService:
         self.bucket_name = os.getenv("GCS_BUCKET")
         if not self.bucket_name:
             logger.warning("GCS_BUCKET not set, storage features disabled")
-            self.client = None
-            self.bucket = None
+
+        # Created on first use or by warm_up(); building the client resolves
+        # credentials, which can mean a metadata server round trip
+        self._client = None
+        self._bucket = None
+
+        # Query logs go through a background batch writer; QUERY_LOG_DIR
+        # sends them to the local filesystem instead of GCS
+        log_dir = os.getenv("QUERY_LOG_DIR")
+        if log_dir:
+            self.log_sink = LocalSink(log_dir)
+        elif self.bucket_name:
+            self.log_sink = GCSSink(lambda: self.bucket)
         else:
-            self.client = storage.Client()
-            self.bucket = self.client.bucket(self.bucket_name)
+            self.log_sink = None
+
+        # Local logs get a sqlite index by default. Without any index,
+        # lookups fail unless QUERY_LOG_INDEX=scan opts into reading every
+        # segment of the query's day.
+        index_type = os.getenv("QUERY_LOG_INDEX", "sqlite" if log_dir else "none")
+        self.scan_logs = index_type == "scan"
+        if index_type == "firestore":
+            self.log_index = FirestoreLogIndex(
+                collection=os.getenv("QUERY_LOG_INDEX_COLLECTION", "query_log_index"),
+                database=os.getenv("QUERY_LOG_INDEX_DATABASE"),
+            )
+        elif index_type == "sqlite":
+            default_path = os.path.join(log_dir or ".", "query_log_index.db")
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+            self.log_index = SQLiteLogIndex(
+                os.getenv("QUERY_LOG_INDEX_PATH", default_path)
+            )
+        else:
+            self.log_index = None
+
+        # Entries still queued or just written, so a GET right after /query
+        # on this instance does not depend on the flush interval
+        self.recent_logs = LRUCache(max_entries=1000)
 
-    def health_check(self) -> bool:
+        self.log_writer = None
+        if self.log_sink:
+            self.log_writer = BatchLogWriter(
+                self.log_sink,
+                prefix=LOG_PREFIX,
+                index=self.log_index,
+                max_queue=int(os.getenv("QUERY_LOG_QUEUE_SIZE", "10000")),
+                max_batch_entries=int(os.getenv("QUERY_LOG_BATCH_ENTRIES", "500")),
+                max_batch_bytes=int(os.getenv("QUERY_LOG_BATCH_BYTES", "1048576")),
+                flush_interval=float(os.getenv("QUERY_LOG_FLUSH_INTERVAL", "5")),
+                compress=os.getenv("QUERY_LOG_COMPRESS", "false").lower() == "true",
+                drop_policy=os.getenv("QUERY_LOG_DROP_POLICY", "drop_newest"),
+            )
+
+    @property
+    def client(self):
+        if self._client is None and self.bucket_name:
+            from google.cloud import storage
+
+            self._client = storage.Client()
+        return self._client
+
+    @property
+    def bucket(self):
+        if self._bucket is None and self.client is not None:
+            self._bucket = self.client.bucket(self.bucket_name)
+        return self._bucket
+
+    async def warm_up(self) -> None:
+        """
+        Create the GCS client in the default thread pool
+        """
+        if self.bucket_name:
+            await asyncio.to_thread(lambda: self.bucket)
+
+    async def health_check(self) -> bool:
         """
-        Check GCS connection health
+        Check GCS connection health. The client is synchronous, so the
+        bucket lookup runs in the default thread pool.
         """
-        if not self.client:
+        if not self.bucket_name:
             return False
 
         try:
-            self.bucket.exists()
-            return True
+            return await asyncio.to_thread(lambda: self.bucket.exists())
         except Exception as e:
             logger.error(f"GCS health check failed: {str(e)}")
             return False
 
     async def log_query(
-        self, query: str, response: str, user_id: Optional[str] = None
+        self,
+        query: str,
+        response: str,
+        user_id: Optional[str] = None,
+        query_id: Optional[str] = None,
     ) -> str:
         """
-        Log query and response to GCS
+        Queue query and response for the background log writer.
+        Logs are keyed by query_id (a UUIDv7 when not supplied).
         """
-        if not self.bucket:
+        if not self.log_writer:
             logger.warning("GCS not configured, skipping log")
             return ""
 
-        try:
-            timestamp = datetime.utcnow()
-            log_id = timestamp.strftime("%Y%m%d_%H%M%S_%f")
-
-            log_data = {
-                "log_id": log_id,
-                "timestamp": timestamp.isoformat(),
-                "user_id": user_id,
-                "query": query,
-                "response": response,
-            }
-
-            blob_name = f"query_logs/{timestamp.strftime('%Y/%m/%d')}/{log_id}.json"
-            blob = self.bucket.blob(blob_name)
+        query_id = query_id or str(uuid7())
+        log_data = {
+            "query_id": query_id,
+            "log_id": query_id,
+            "timestamp": datetime.utcnow().isoformat(),
+            "user_id": user_id,
+            "query": query,
+            "response": response,
+        }
 
-            blob.upload_from_string(
-                json.dumps(log_data, indent=2), content_type="application/json"
-            )
+        with stage("log"):
+            queued = await self.log_writer.put(log_data)
+        if not queued:
+            logger.warning("Query log entry dropped (queue full or writer closed)")
+            return ""
 
-            logger.info(f"Query logged to GCS: {blob_name}")
-            return log_id
+        self.recent_logs.set(query_id, log_data)
+        return query_id
 
-        except Exception as e:
-            logger.error(f"Failed to log query to GCS: {str(e)}")
-            return ""
+    async def log_queries(self, entries: List[Dict[str, Any]]) -> List[str]:
+        """
+        Queue several query logs at once (each a dict with query, response
+        and optionally user_id and query_id). Queued back to back, they are
+        written together in as few segments as the batch limits allow.
+        Returns the query_ids, "" for entries that were dropped.
+        """
+        if not self.log_writer:
+            logger.warning("GCS not configured, skipping log")
+            return [""] * len(entries)
+
+        timestamp = datetime.utcnow().isoformat()
+        query_ids = []
+        with stage("log"):
+            for entry in entries:
+                query_id = entry.get("query_id") or str(uuid7())
+                log_data = {
+                    "query_id": query_id,
+                    "log_id": query_id,
+                    "timestamp": timestamp,
+                    "user_id": entry.get("user_id"),
+                    "query": entry["query"],
+                    "response": entry["response"],
+                }
+                if await self.log_writer.put(log_data):
+                    self.recent_logs.set(query_id, log_data)
+                    query_ids.append(query_id)
+                else:
+                    query_ids.append("")
+
+        dropped = query_ids.count("")
+        if dropped:
+            logger.warning(
+                f"{dropped} query log entries dropped (queue full or writer closed)"
+            )
+        return query_ids
 
-    async def get_query_log(self, log_id: str) -> Optional[Dict[str, Any]]:
+    async def get_query_log(self, query_id: str) -> Optional[Dict[str, Any]]:
         """
-        Retrieve a query log from GCS
+        Retrieve a query log by query_id: from recent entries, else through
+        the index with a single ranged read. Scanning the day partition
+        derived from the ID happens only with QUERY_LOG_INDEX=scan; without
+        an index, QueryLogLookupUnavailable is raised.
         """
-        if not self.bucket:
+        if not self.log_sink:
             return None
 
+        recent = self.recent_logs.get(query_id)
+        if recent is not None:
+            return recent
+
+        legacy = _LEGACY_LOG_ID_RE.match(query_id)
+        if self.log_index is None and not self.scan_logs and not legacy:
+            raise QueryLogLookupUnavailable(
+                "Query log lookups need an index: set QUERY_LOG_INDEX to "
+                "firestore or sqlite (or scan to read the day's segments)"
+            )
+
         try:
-            prefix = "query_logs/"
-            blobs = self.bucket.list_blobs(prefix=prefix)
+            if self.log_index is not None:
+                location = await self.log_index.get(query_id)
+                if location is not None:
+                    segment, offset, length = location
+                    data = await self.log_sink.read_range(segment, offset, length)
+                    entries = decode_segment(segment, data)
+                    return entries[0] if entries else None
 
-            for blob in blobs:
-                if log_id in blob.name:
-                    content = blob.download_as_string()
-                    return json.loads(content)
+            if legacy:
+                created = datetime.strptime(query_id, "%Y%m%d_%H%M%S_%f")
+                name = f"{LOG_PREFIX}/{created.strftime('%Y/%m/%d')}/{query_id}.json"
+                content = await self.log_sink.read(name)
+                return json.loads(content) if content is not None else None
+
+            created = uuid7_datetime(query_id)
+            if created is None or not self.scan_logs:
+                return None
+
+            # Segments are named by flush time, which can fall on the next day
+            for day in (created, created + timedelta(days=1)):
+                prefix = f"{LOG_PREFIX}/{day.strftime('%Y/%m/%d')}/"
+                for name in await self.log_sink.list(prefix):
+                    content = await self.log_sink.read(name)
+                    if content is None:
+                        continue
+                    for entry in decode_segment(name, content):
+                        if entry.get("query_id") == query_id:
+                            return entry
 
             return None
 
@@ -95,6 +259,40 @@ class StorageService:
             logger.error(f"Failed to retrieve query log: {str(e)}")
             return None
 
+    async def save_job(self, job: Dict[str, Any]) -> None:
+        """
+        Persist a background job record (status and, once finished, the
+        result) so any instance can answer polls for it
+        """
+        if not self.log_sink:
+            return
+        await self.log_sink.write(
+            f"{JOB_PREFIX}/{job['job_id']}.json",
+            json.dumps(job, default=str).encode(),
+            "application/json",
+        )
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve a persisted job record
+        """
+        if not self.log_sink or uuid7_datetime(job_id) is None:
+            return None
+
+        try:
+            content = await self.log_sink.read(f"{JOB_PREFIX}/{job_id}.json")
+            return json.loads(content) if content is not None else None
+        except Exception as e:
+            logger.error(f"Failed to retrieve job: {str(e)}")
+            return None
+
+    async def close(self):
+        """
+        Flush pending query logs
+        """
+        if self.log_writer:
+            await self.log_writer.close()
+
     async def store_artifact(
         self,
         artifact_name: str,
@@ -104,7 +302,7 @@ class StorageService:
         """
         Store arbitrary artifacts in GCS
         """
-        if not self.bucket:
+        if not self.bucket_name:
             raise ValueError("GCS not configured")
 
         try:
@@ -0,0 +1,63 @@
+from typing import Any, Sequence
+
+AUTO = "auto"
+LLM = "llm"
+TEMPLATE = "template"
+NONE = "none"
+
+STRATEGIES = (AUTO, LLM, TEMPLATE, NONE)
+
+# Largest result that auto mode phrases with a template instead of the LLM
+TEMPLATE_MAX_ROWS = 5
+TEMPLATE_MAX_COLUMNS = 4
+
+
+def choose_strategy(
+    strategy: str, column_count: int, row_count: int, truncated: bool
+) -> str:
+    """
+    Resolve auto into template for empty, scalar or small results and
+    into llm for everything else
+    """
+    if strategy != AUTO:
+        return strategy
+
+    if row_count == 0:
+        return TEMPLATE
+    if truncated:
+        return LLM
+    if row_count <= TEMPLATE_MAX_ROWS and column_count <= TEMPLATE_MAX_COLUMNS:
+        return TEMPLATE
+    return LLM
+
+
+def _format_value(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, float):
+        return f"{value:,.2f}".rstrip("0").rstrip(".")
+    return str(value)
+
+
+def template_summary(
+    columns: Sequence[str], rows: Sequence[Sequence[Any]], count: int
+) -> str:
+    """
+    Deterministic summary for small results
+    """
+    if count == 0:
+        return "No results found."
+
+    if count == 1 and len(columns) == 1:
+        return f"The {columns[0]} is {_format_value(rows[0][0])}."
+
+    lines = [f"Found {count} result{'s' if count != 1 else ''}:"]
+    for row in rows:
+        fields = ", ".join(
+            f"{column}: {_format_value(value)}" for column, value in zip(columns, row)
+        )
+        lines.append(f"- {fields}")
+    if count > len(rows):
+        lines.append(f"... and {count - len(rows)} more")
+
+    return "\n".join(lines)
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def test_timed_out_waiters_leave_the_queue():
+    async def run():
+        controller = AdmissionController(
+            max_in_flight=1, max_in_flight_per_user=1, max_queue=1, queue_timeout=0.01
+        )
+        ticket = await controller.acquire("a")
+
+        with pytest.raises(AdmissionRejected) as exc:
+            await controller.acquire("b")
+        assert exc.value.reason == "timeout"
+
+        # The expired waiter no longer fills the queue
+        waiter = asyncio.create_task(controller.acquire("c"))
+        await asyncio.sleep(0)
+        ticket.release()
+        (await waiter).release()
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiters_leave_the_queue():
+    async def run():
+        controller = AdmissionController(
+            max_in_flight=1, max_in_flight_per_user=1, max_queue=1, queue_timeout=5
+        )
+        ticket = await controller.acquire("a")
+
+        waiter = asyncio.create_task(controller.acquire("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        waiter = asyncio.create_task(controller.acquire("c"))
+        await asyncio.sleep(0)
+        assert controller.stats()["queued"] == 1
+        ticket.release()
+        (await waiter).release()
+        assert controller.stats() == {"in_flight": 0, "queued": 0, "callers": 0}
+
+    asyncio.run(run())
@@ -0,0 +1,56 @@
+import asyncio
+
+import logging_config
+import metrics
+from log_pipeline import BatchLogWriter
+from schema_cache import SchemaCache
+
+
+def _request_context():
+    logging_config.set_request_id("req-1")
+    return metrics.start_timings()
+
+
+def _current_context():
+    return logging_config._request_id.get(), metrics._timings.get()
+
+
+class RecordingSink:
+    def __init__(self):
+        self.contexts = []
+
+    async def write(self, name, data, content_type):
+        self.contexts.append(_current_context())
+
+
+def test_log_writer_does_not_inherit_request_context():
+    async def run():
+        sink = RecordingSink()
+        writer = BatchLogWriter(sink, prefix="logs")
+        _request_context()
+        await writer.put({"query_id": "q1"})
+        await writer.close()
+        assert sink.contexts == [(None, None)]
+
+    asyncio.run(run())
+
+
+def test_schema_refresh_does_not_inherit_request_context():
+    async def run():
+        contexts = []
+
+        async def fingerprinter():
+            contexts.append(_current_context())
+            return "fp"
+
+        async def loader():
+            return {}
+
+        cache = SchemaCache(loader, fingerprinter, ttl_seconds=0)
+        await cache.get()
+        _request_context()
+        await cache.get()
+        await cache._refresh_task
+        assert contexts[-1] == (None, None)
+
+    asyncio.run(run())
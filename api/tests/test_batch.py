@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from ai_agent import AIAgent
+from result_set import ResultSet
+from schema_cache import SchemaSnapshot
+
+
+def _agent():
+    async def get_schema_snapshot():
+        return SchemaSnapshot(schema={}, prompt="", fingerprint="fp")
+
+    db_service = SimpleNamespace(
+        pool_size=5,
+        read_pool_size=5,
+        get_schema_snapshot=get_schema_snapshot,
+        sql_fingerprint=lambda sql: sql,
+    )
+    return AIAgent(db_service=db_service, storage_service=None)
+
+
+def test_closing_a_batch_cancels_the_pipelines_still_running():
+    async def run():
+        agent = _agent()
+        outcomes = {}
+
+        async def answer(query, context, summary, schema, slots):
+            try:
+                await asyncio.sleep(0 if query == "fast" else 10)
+            except asyncio.CancelledError:
+                outcomes[query] = "cancelled"
+                raise
+            outcomes[query] = "finished"
+            return {
+                "response": query,
+                "result_set": ResultSet(["n"], [(1,)]),
+                "sql_query": "SELECT 1",
+                "cached_at": None,
+                "summary_strategy": "none",
+            }
+
+        agent._answer = answer
+        items = [{"query": q} for q in ("fast", "slow 1", "slow 2")]
+        batch = agent.process_batch(items)
+        index, _ = await batch.__anext__()
+        assert index == 0
+
+        # What the response does when the client disconnects
+        await batch.aclose()
+        await asyncio.sleep(0.01)
+        assert outcomes == {
+            "fast": "finished",
+            "slow 1": "cancelled",
+            "slow 2": "cancelled",
+        }
+
+    asyncio.run(run())
+
+
+def test_sdk_is_loaded_off_the_event_loop():
+    async def run():
+        agent, threads = _agent(), []
+        agent.client = SimpleNamespace()
+        load_sdk = agent._load_sdk
+
+        def recording_load_sdk():
+            threads.append(threading.get_ident())
+            load_sdk()
+
+        agent._load_sdk = recording_load_sdk
+        await agent._ensure_sdk()
+        await agent._ensure_sdk()
+        assert len(threads) == 1 and threads[0] != threading.get_ident()
+        assert agent._generation_config(max_output_tokens=1).max_output_tokens == 1
+
+    asyncio.run(run())
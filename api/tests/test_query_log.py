@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from storage import QueryLogLookupUnavailable, StorageService
+
+
+def _storage(monkeypatch, tmp_path, index=None):
+    monkeypatch.setenv("QUERY_LOG_DIR", str(tmp_path))
+    if index is not None:
+        monkeypatch.setenv("QUERY_LOG_INDEX", index)
+    return StorageService()
+
+
+def test_local_logs_are_found_through_the_default_index(monkeypatch, tmp_path):
+    async def run():
+        storage = _storage(monkeypatch, tmp_path)
+        query_id = await storage.log_query("How many users?", "42 users")
+        await storage.log_writer.close()
+        storage.recent_logs.clear()
+
+        entry = await storage.get_query_log(query_id)
+        assert entry["response"] == "42 users"
+
+    asyncio.run(run())
+
+
+def test_lookup_without_index_fails_fast(monkeypatch, tmp_path):
+    async def run():
+        storage = _storage(monkeypatch, tmp_path, index="none")
+        query_id = await storage.log_query("How many users?", "42 users")
+        await storage.log_writer.close()
+        storage.recent_logs.clear()
+
+        with pytest.raises(QueryLogLookupUnavailable):
+            await storage.get_query_log(query_id)
+
+        storage.scan_logs = True
+        assert (await storage.get_query_log(query_id))["query_id"] == query_id
+
+    asyncio.run(run())
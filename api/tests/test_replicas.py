@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from replicas import ReplicaSet, ReplicationStopped, replication_lag
+
+
+def _row(**overrides):
+    row = dict(
+        in_recovery=True,
+        receiver_pid=42,
+        receiver_status="streaming",
+        caught_up=True,
+        replay_age=120.0,
+    )
+    row.update(overrides)
+    return SimpleNamespace(**row)
+
+
+def test_standalone_server_does_not_lag():
+    assert replication_lag(_row(in_recovery=False, receiver_pid=None)) == 0
+
+
+def test_streaming_replica_that_replayed_everything_is_current():
+    assert replication_lag(_row()) == 0
+
+
+def test_streaming_replica_behind_uses_replay_age():
+    assert replication_lag(_row(caught_up=False)) == 120
+
+
+@pytest.mark.parametrize(
+    "row",
+    [
+        # Receiver gone: receive LSN frozen at the replay LSN
+        _row(receiver_pid=None, receiver_status=None),
+        _row(receiver_status="waiting"),
+    ],
+)
+def test_replica_without_streaming_receiver_is_stopped(row):
+    with pytest.raises(ReplicationStopped):
+        replication_lag(row)
+
+
+def test_unconfirmed_streaming_falls_back_to_replay_age():
+    # Roles without pg_read_all_stats only see the receiver's pid
+    assert replication_lag(_row(receiver_status=None)) == 120
+
+
+def test_disconnected_replica_leaves_rotation():
+    async def run():
+        replicas = ReplicaSet(max_lag_seconds=30)
+        replica = replicas.add("replica-1", engine=None)
+        rows = {"row": _row()}
+
+        async def lag(replica):
+            return replication_lag(rows["row"])
+
+        replicas._lag = lag
+        await replicas.refresh()
+        assert replica.in_rotation
+
+        rows["row"] = _row(receiver_pid=None, receiver_status=None)
+        await replicas.refresh()
+        assert not replica.in_rotation
+        assert replica.error == "no WAL receiver running"
+        assert replicas.pick() is None
+
+    asyncio.run(run())
@@ -0,0 +1,150 @@
+import asyncio
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from database import DatabaseService
+from result_cache import (
+    InMemoryStore,
+    InProcessBackend,
+    ResultCache,
+    ResultCacheBackend,
+    SharedStoreBackend,
+)
+from result_set import ResultSet
+from sql_utils import referenced_tables
+
+
+def test_referenced_tables_includes_comma_joined_tables():
+    sql = "WITH t AS (SELECT * FROM a JOIN public.b ON a.id = b.id) SELECT * FROM t, c"
+    assert referenced_tables(sql) == {"a", "b", "c"}
+    assert referenced_tables(
+        "SELECT * FROM x JOIN y USING (id), z AS w, lateral (SELECT 1 FROM v) q"
+    ) == {"x", "y", "z", "v"}
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        ResultCacheBackend()
+
+
+@pytest.mark.parametrize(
+    "backend",
+    [
+        lambda: InProcessBackend(max_bytes=1 << 20),
+        lambda: SharedStoreBackend(InMemoryStore()),
+    ],
+)
+def test_invalidate_drops_entries_of_the_table(backend):
+    async def run():
+        cache = ResultCache(backend())
+        sql = "SELECT id FROM users, orders WHERE users.id = orders.user_id"
+        key = await cache.key_for(sql)
+        await cache.set(key, ResultSet(["id"], [(1,)]))
+        assert (await cache.get(await cache.key_for(sql)))["result"].rows == [(1,)]
+
+        await cache.invalidate(["products"])
+        assert await cache.get(await cache.key_for(sql)) is not None
+
+        await cache.invalidate(["orders"])
+        assert await cache.get(await cache.key_for(sql)) is None
+
+    asyncio.run(run())
+
+
+def test_schema_change_invalidates_changed_tables():
+    async def run():
+        db = DatabaseService()
+
+        def table(*names):
+            columns = [{"name": n, "type": "INTEGER", "nullable": True} for n in names]
+            return {"columns": columns, "primary_key": {}, "foreign_keys": []}
+
+        schema = {"users": table("id"), "orders": table("id")}
+        fingerprint = "v1"
+
+        async def loader():
+            return dict(schema)
+
+        async def fingerprinter():
+            return fingerprint
+
+        db.schema_cache._loader = loader
+        db.schema_cache._fingerprinter = fingerprinter
+        await db.schema_cache.get()
+
+        users_sql, orders_sql = "SELECT * FROM users", "SELECT * FROM orders"
+        for sql in (users_sql, orders_sql):
+            cache_key = await db.result_cache.key_for(sql)
+            await db.result_cache.set(cache_key, ResultSet(["id"], [(1,)]))
+
+        schema["orders"] = table("id", "total")
+        fingerprint = "v2"
+        await db.schema_cache._revalidate()
+
+        cache = db.result_cache
+        assert await cache.get(await cache.key_for(users_sql)) is not None
+        assert await cache.get(await cache.key_for(orders_sql)) is None
+        await db.close()
+
+    asyncio.run(run())
+
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setenv("RESULT_CACHE_BACKEND", "redis-ish")
+    with pytest.raises(ValueError):
+        DatabaseService()
+
+
+class _BrokenStore(InMemoryStore):
+    async def get(self, key):
+        raise ConnectionError("store unreachable")
+
+    async def incr(self, key):
+        raise ConnectionError("store unreachable")
+
+
+def test_store_outage_runs_queries_uncached():
+    async def run():
+        db = DatabaseService()
+        db.result_cache = ResultCache(SharedStoreBackend(_BrokenStore()))
+        db.validate_sql = lambda sql: sql
+
+        async def fetch_result(sql):
+            return ResultSet(["id"], [(1,)])
+
+        db.fetch_result = fetch_result
+        result, cached_at = await db.execute_cached("SELECT id FROM users")
+        assert result.rows == [(1,)] and cached_at is None
+        assert await db.invalidate_results(["users"]) is False
+        await db.close()
+
+    asyncio.run(run())
+
+
+def test_shared_store_preserves_value_types():
+    async def run():
+        cache = ResultCache(SharedStoreBackend(InMemoryStore()))
+        row = (
+            datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+            date(2024, 5, 1),
+            time(8, 15),
+            timedelta(days=1, seconds=5),
+            Decimal("9.99"),
+            uuid.UUID(int=7),
+            b"\x00\xff",
+            {"__type__": "decimal", "value": "1", "other": 2},
+            None,
+        )
+        key = await cache.key_for("SELECT * FROM t")
+        await cache.set(key, ResultSet([f"c{i}" for i in range(len(row))], [row]))
+        assert (await cache.get(key))["result"].rows == [row]
+
+        # Values without a lossless encoding are not cached at all
+        key = await cache.key_for("SELECT * FROM u")
+        await cache.set(key, ResultSet(["c"], [(object(),)]))
+        assert await cache.get(key) is None
+
+    asyncio.run(run())
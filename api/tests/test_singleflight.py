@@ -0,0 +1,98 @@
+import asyncio
+
+import logging_config
+from jobs import TIMED_OUT, JobManager
+from metrics import add_timings, stage, start_timings
+from singleflight import SingleFlight
+
+
+class Pipeline:
+    """
+    Stand-in for the coalesced query pipeline: records whether it ran to
+    completion or was cancelled
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.outcome = None
+
+    async def __call__(self):
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            self.outcome = "cancelled"
+            raise
+        self.outcome = "finished"
+        return "answer"
+
+
+def test_cancelling_one_of_two_waiters_keeps_the_flight():
+    async def run():
+        flight, pipeline = SingleFlight(), Pipeline(0.05)
+        first = asyncio.ensure_future(flight.do("q", pipeline))
+        second = asyncio.ensure_future(flight.do("q", pipeline))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "answer"
+        assert pipeline.outcome == "finished"
+
+    asyncio.run(run())
+
+
+def test_cancelling_the_last_waiter_cancels_the_flight():
+    async def run():
+        flight, pipeline = SingleFlight(), Pipeline(10)
+        waiter = asyncio.ensure_future(flight.do("q", pipeline))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        assert pipeline.outcome == "cancelled"
+        assert not flight.in_flight("q")
+
+        # The next caller starts a fresh flight instead of joining it
+        assert await flight.do("q", Pipeline(0)) == "answer"
+
+    asyncio.run(run())
+
+
+def test_timed_out_job_cancels_its_pipeline():
+    async def run():
+        flight, pipeline = SingleFlight(), Pipeline(10)
+
+        async def run_job(payload):
+            return {"response": await flight.do(payload["query"], pipeline)}
+
+        manager = JobManager(run_job, workers=1)
+        manager.start()
+        job = await manager.submit({"query": "q"}, timeout=0.05)
+        await asyncio.sleep(0.2)
+
+        assert (await manager.get(job["job_id"]))["status"] == TIMED_OUT
+        assert pipeline.outcome == "cancelled"
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_flight_runs_outside_the_leaders_context():
+    async def run():
+        flight, seen = SingleFlight(), []
+
+        async def work():
+            seen.append(logging_config._request_id.get())
+            timings = start_timings()
+            with stage("work"):
+                await asyncio.sleep(0.01)
+            return timings
+
+        async def caller(request_id):
+            logging_config.set_request_id(request_id)
+            timings = start_timings()
+            add_timings(await flight.do("q", work))
+            return timings
+
+        leader, follower = await asyncio.gather(caller("leader"), caller("follower"))
+        assert seen == [None]
+        assert leader.keys() == follower.keys() == {"work"}
+
+    asyncio.run(run())
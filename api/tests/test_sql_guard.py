@@ -0,0 +1,90 @@
+import pytest
+
+from database import DatabaseService
+from sql_guard import SQLGuard, SQLGuardError
+from sql_utils import canonicalize_sql, split_literals
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        # E'\'' is one literal; read as '\' it would swallow the DELETE and
+        # push the injected LIMIT behind the trailing comment
+        "WITH a AS (SELECT E'\\''), d AS (DELETE FROM users RETURNING 1) "
+        "SELECT * FROM d --'",
+        "SELECT E'\\''; DELETE FROM users; SELECT '",
+        "SELECT e'a\\'b' AS x",
+        "SELECT $$; DELETE FROM users; $$ AS x",
+        "SELECT $a$ ' $a$, id FROM users WHERE name = ' $a$; DROP TABLE users",
+        "SELECT $fn$x$fn$ AS x",
+    ],
+)
+def test_escape_strings_and_dollar_quotes_are_rejected(sql):
+    with pytest.raises(SQLGuardError):
+        SQLGuard(1001).validate(sql)
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT 'it''s' AS x; DELETE FROM users",
+        "SELECT * FROM users WHERE name = 'open",
+        'SELECT "open FROM users',
+        "SELECT 1 /* DELETE FROM users",
+        "SELECT * FROM users WHERE id = $1",
+    ],
+)
+def test_multiple_or_unterminated_statements_are_rejected(sql):
+    with pytest.raises(SQLGuardError):
+        SQLGuard(1001).validate(sql)
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("SELECT * FROM users", "SELECT * FROM users LIMIT 1001"),
+        (
+            "SELECT name FROM users WHERE note = 'a;b -- DELETE' LIMIT 5000",
+            "SELECT name FROM users WHERE note = 'a;b -- DELETE' LIMIT 1001",
+        ),
+        (
+            'SELECT "select" FROM t /* note */ LIMIT 10;',
+            'SELECT "select" FROM t LIMIT 10',
+        ),
+        (
+            "SELECT note FROM t WHERE type = 'x'",
+            "SELECT note FROM t WHERE type = 'x' LIMIT 1001",
+        ),
+    ],
+)
+def test_select_is_accepted_and_limited(sql, expected):
+    assert SQLGuard(1001).validate(sql) == expected
+
+
+@pytest.mark.parametrize(
+    "sql", ["DELETE FROM users", "SELECT * INTO copy FROM users", "SELECT pg_sleep(10)"]
+)
+def test_writes_and_side_effects_are_rejected(sql):
+    with pytest.raises(SQLGuardError):
+        SQLGuard(1001).validate(sql)
+
+
+def test_literal_tokenizer_keeps_quoted_text_whole():
+    assert split_literals("SELECT E'\\'', $t$ ' $t$, 'a''b'") == [
+        "SELECT ",
+        "E'\\''",
+        ", ",
+        "$t$ ' $t$",
+        ", ",
+        "'a''b'",
+        "",
+    ]
+    assert (
+        canonicalize_sql("SELECT $$ -- kept $$  -- dropped") == "SELECT $$ -- kept $$"
+    )
+
+
+def test_connections_are_read_only():
+    settings = DatabaseService()._connect_args()["server_settings"]
+    assert settings["default_transaction_read_only"] == "on"
+    assert settings["standard_conforming_strings"] == "on"
@@ -0,0 +1,41 @@
+import sqlite3
+
+import pytest
+
+from sql_utils import parameterize_sql
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE items (qty INTEGER, price NUMERIC, name TEXT)")
+    conn.executemany(
+        "INSERT INTO items VALUES (?, ?, ?)",
+        [(1, 9.99, "a"), (2, 10.5, "b"), (3, 2.5, "c")],
+    )
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT name FROM items WHERE qty > 2.5 ORDER BY name",
+        "SELECT name FROM items WHERE qty >= 2 ORDER BY name",
+        "SELECT name FROM items WHERE price = 9.99 ORDER BY name",
+        "SELECT name FROM items WHERE price < 10 AND name <> 'c' ORDER BY name",
+    ],
+)
+def test_template_matches_literal_sql(conn, sql):
+    template, params = parameterize_sql(sql)
+    assert conn.execute(template, params).fetchall() == conn.execute(sql).fetchall()
+
+
+def test_decimals_stay_inline():
+    template, params = parameterize_sql(
+        "SELECT * FROM items WHERE qty > 2.5 AND price = 9.99 AND qty < 3"
+    )
+    assert (
+        template == "SELECT * FROM items WHERE qty > 2.5 AND price = 9.99 AND qty < :p1"
+    )
+    assert params == {"p1": 3}
@@ -40,10 +40,12 @@ resource "google_cloud_run_v2_service" "api" {
   ingress  = "INGRESS_TRAFFIC_ALL"
 
   template {
-    service_account = google_service_account.cloud_run_sa.email
+    service_account                  = google_service_account.cloud_run_sa.email
+    max_instance_request_concurrency = var.max_concurrency
 
     scaling {
-      min_instance_count = var.min_instances
+      # Queued jobs would be lost if the last instance scaled in
+      min_instance_count = var.enable_jobs ? max(var.min_instances, 1) : var.min_instances
       max_instance_count = var.max_instances
     }
 
@@ -59,11 +61,26 @@ resource "google_cloud_run_v2_service" "api" {
         value = var.project_id
       }
 
+      env {
+        name  = "JOBS_ENABLED"
+        value = tostring(var.enable_jobs)
+      }
+
       env {
         name  = "GCS_BUCKET"
         value = google_storage_bucket.ai_agent_storage.name
       }
 
+      env {
+        name  = "QUERY_LOG_INDEX"
+        value = "firestore"
+      }
+
+      env {
+        name  = "QUERY_LOG_INDEX_DATABASE"
+        value = google_firestore_database.query_log_index.name
+      }
+
       env {
         name  = "DB_TYPE"
         value = "cloudsql"
@@ -109,12 +126,18 @@ resource "google_cloud_run_v2_service" "api" {
           cpu    = "1"
           memory = "512Mi"
         }
-        cpu_idle = true
+        # Background /jobs keep running after their 202 response, so they
+        # need CPU allocated outside requests
+        cpu_idle = !var.enable_jobs
+        # Extra CPU while the instance starts (imports and warm-up)
+        startup_cpu_boost = true
       }
 
+      # Both probes answer from memory; dependency checks run in the
+      # background every HEALTH_CHECK_INTERVAL seconds
       startup_probe {
         http_get {
-          path = "/health"
+          path = "/health/ready"
         }
         initial_delay_seconds = 0
         timeout_seconds       = 1
@@ -124,7 +147,7 @@ resource "google_cloud_run_v2_service" "api" {
 
       liveness_probe {
         http_get {
-          path = "/health"
+          path = "/health/live"
         }
         initial_delay_seconds = 30
         timeout_seconds       = 1
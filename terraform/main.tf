@@ -51,6 +51,7 @@ resource "google_project_service" "required_apis" {
     "servicecontrol.googleapis.com",
     "servicemanagement.googleapis.com",
     "storage.googleapis.com",
+    "firestore.googleapis.com",
     "cloudresourcemanager.googleapis.com",
     "iam.googleapis.com",
     "vpcaccess.googleapis.com",
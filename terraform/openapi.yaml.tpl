@@ -42,7 +42,18 @@ paths:
         - application/json
       produces:
         - application/json
+        - application/vnd.columnar+json
+        - application/vnd.apache.arrow.stream
       parameters:
+        - in: query
+          name: format
+          required: false
+          type: string
+          enum:
+            - json
+            - columnar
+            - arrow
+          description: Result format (defaults to row-oriented JSON)
         - in: body
           name: body
           required: true
@@ -60,6 +71,10 @@ paths:
               context:
                 type: object
                 description: Optional additional context
+              summary:
+                type: string
+                enum: [auto, llm, template, none]
+                description: How to summarize the result (default auto)
       responses:
         '200':
           description: Query processed successfully
@@ -74,12 +89,226 @@ paths:
                 type: string
               timestamp:
                 type: string
+              cached:
+                type: boolean
         '400':
           description: Bad request
+        '406':
+          description: Requested format not available
+        '429':
+          description: Too many concurrent requests (see Retry-After)
         '500':
           description: Internal server error
+        '503':
+          description: Model unavailable (see Retry-After)
       x-google-backend:
         address: ${cloud_run_url}/query
+  /query/stream:
+    post:
+      summary: Process AI agent query, streaming SQL, rows and summary
+      operationId: processQueryStream
+      consumes:
+        - application/json
+      produces:
+        - application/x-ndjson
+        - text/event-stream
+      parameters:
+        - in: body
+          name: body
+          required: true
+          schema:
+            type: object
+            required:
+              - query
+            properties:
+              query:
+                type: string
+                description: User query in natural language
+              user_id:
+                type: string
+                description: Optional user identifier
+              context:
+                type: object
+                description: Optional additional context
+              summary:
+                type: string
+                enum: [auto, llm, template, none]
+                description: How to summarize the result (default auto)
+      responses:
+        '200':
+          description: Stream of sql, columns, rows, summary and done events
+      x-google-backend:
+        address: ${cloud_run_url}/query/stream
+  /query/batch:
+    post:
+      summary: Process many AI agent queries concurrently
+      operationId: processQueryBatch
+      consumes:
+        - application/json
+      produces:
+        - application/json
+        - application/x-ndjson
+        - text/event-stream
+      parameters:
+        - in: query
+          name: format
+          required: false
+          type: string
+          enum:
+            - json
+            - columnar
+          description: Result format of each item (defaults to row-oriented JSON)
+        - in: body
+          name: body
+          required: true
+          schema:
+            type: object
+            required:
+              - queries
+            properties:
+              queries:
+                type: array
+                items:
+                  type: object
+                  required:
+                    - query
+                  properties:
+                    query:
+                      type: string
+                      description: User query in natural language
+                    context:
+                      type: object
+                      description: Optional additional context
+                    summary:
+                      type: string
+                      enum: [auto, llm, template, none]
+                      description: How to summarize this result
+              user_id:
+                type: string
+                description: Optional user identifier
+              summary:
+                type: string
+                enum: [auto, llm, template, none]
+                description: Default summary for items that do not set one
+      responses:
+        '200':
+          description: >-
+            Results in request order, or one result event per item as it
+            completes followed by done when streaming
+          schema:
+            type: object
+            properties:
+              results:
+                type: array
+                items:
+                  type: object
+              count:
+                type: integer
+              errors:
+                type: integer
+        '400':
+          description: Bad request
+        '406':
+          description: Requested format not available
+      x-google-backend:
+        address: ${cloud_run_url}/query/batch
+  /jobs:
+    post:
+      summary: Queue an AI agent query to run in the background
+      operationId: submitJob
+      consumes:
+        - application/json
+      parameters:
+        - in: query
+          name: format
+          required: false
+          type: string
+          enum:
+            - json
+            - columnar
+          description: Result format (defaults to row-oriented JSON)
+        - in: body
+          name: body
+          required: true
+          schema:
+            type: object
+            required:
+              - query
+            properties:
+              query:
+                type: string
+                description: User query in natural language
+              user_id:
+                type: string
+                description: Optional user identifier
+              context:
+                type: object
+                description: Optional additional context
+              summary:
+                type: string
+                enum: [auto, llm, template, none]
+                description: How to summarize the result (default auto)
+              priority:
+                type: string
+                enum: [high, normal, low]
+                description: Queue priority (default normal)
+              timeout_seconds:
+                type: number
+                description: Job timeout (defaults to the server setting)
+      responses:
+        '202':
+          description: Job queued
+          schema:
+            type: object
+        '400':
+          description: Bad request
+        '404':
+          description: Background jobs are disabled
+        '503':
+          description: Job queue is full
+      x-google-backend:
+        address: ${cloud_run_url}/jobs
+  /jobs/{job_id}:
+    get:
+      summary: Get background job status and result
+      operationId: getJob
+      parameters:
+        - in: path
+          name: job_id
+          required: true
+          type: string
+          description: Job ID
+      responses:
+        '200':
+          description: Job status, with the result once it succeeded
+          schema:
+            type: object
+        '404':
+          description: Job not found
+      x-google-backend:
+        address: ${cloud_run_url}
+        path_translation: APPEND_PATH_TO_ADDRESS
+    delete:
+      summary: Cancel a background job
+      operationId: cancelJob
+      parameters:
+        - in: path
+          name: job_id
+          required: true
+          type: string
+          description: Job ID
+      responses:
+        '200':
+          description: Job cancelled
+          schema:
+            type: object
+        '404':
+          description: Job not found
+        '409':
+          description: Job already finished or running on another instance
+      x-google-backend:
+        address: ${cloud_run_url}
+        path_translation: APPEND_PATH_TO_ADDRESS
   /queries/{query_id}:
     get:
       summary: Get query result
@@ -99,6 +328,8 @@ paths:
           description: Query not found
         '500':
           description: Internal server error
+        '501':
+          description: No query log index configured (QUERY_LOG_INDEX)
       x-google-backend:
         address: ${cloud_run_url}
         path_translation: APPEND_PATH_TO_ADDRESS
@@ -42,6 +42,29 @@ resource "google_storage_bucket_iam_member" "cloud_run_storage_bucket_reader" {
   member = "serviceAccount:${google_service_account.cloud_run_sa.email}"
 }
 
+resource "google_firestore_database" "query_log_index" {
+  name        = "${local.service_name}-logs"
+  location_id = var.region
+  type        = "FIRESTORE_NATIVE"
+
+  depends_on = [google_project_service.required_apis]
+}
+
+resource "google_firestore_field" "query_log_index_ttl" {
+  database   = google_firestore_database.query_log_index.name
+  collection = "query_log_index"
+  field      = "expire_at"
+
+  ttl_config {}
+  index_config {}
+}
+
+resource "google_project_iam_member" "cloud_run_firestore_user" {
+  project = var.project_id
+  role    = "roles/datastore.user"
+  member  = "serviceAccount:${google_service_account.cloud_run_sa.email}"
+}
+
 output "storage_bucket_name" {
   description = "GCS bucket name for storage"
   value       = google_storage_bucket.ai_agent_storage.name
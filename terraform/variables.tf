@@ -69,6 +69,18 @@ variable "max_instances" {
   default     = 10
 }
 
+variable "enable_jobs" {
+  description = "Serve background /jobs (keeps CPU allocated and at least one instance running)"
+  type        = bool
+  default     = false
+}
+
+variable "max_concurrency" {
+  description = "Maximum concurrent requests served by one Cloud Run instance"
+  type        = number
+  default     = 80
+}
+
 variable "alert_email" {
   description = "Email address for monitoring alerts"
   type        = string